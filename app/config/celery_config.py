@@ -10,7 +10,11 @@ enable_utc = True
 # Task Routing
 task_routes = {
     'app.tasks.library_tasks.send_overdue_notices': {'queue': 'notifications'},
+    'app.tasks.library_tasks.send_overdue_notice_batch': {'queue': 'notifications'},
+    'app.tasks.library_tasks.send_due_soon_notice_batch': {'queue': 'notifications'},
     'app.tasks.library_tasks.generate_weekly_report': {'queue': 'reports'},
+    'app.tasks.library_tasks.reconcile_book_availability': {'queue': 'reports'},
+    'app.tasks.library_tasks.rollup_daily_analytics': {'queue': 'reports'},
 }
 
 # Beat Schedule Configuration
@@ -36,6 +40,18 @@ beat_schedule = {
         'options': {'queue': 'notifications'},
     },
     
+    'availability-reconciliation': {
+        'task': 'app.tasks.library_tasks.reconcile_book_availability',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+        'options': {'queue': 'reports'},
+    },
+    
+    'daily-analytics-rollup': {
+        'task': 'app.tasks.library_tasks.rollup_daily_analytics',
+        'schedule': crontab(hour=0, minute=15),  # Nightly, once the previous day has closed
+        'options': {'queue': 'reports'},
+    },
+    
     'monthly-analytics': {
         'task': 'app.tasks.library_tasks.generate_monthly_analytics',
         'schedule': crontab(0, 0, day_of_month='1'),  # Monthly on the 1st
@@ -1,11 +1,35 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InterfaceError, OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
+from typing import Dict, Iterable, List, Optional
 import os
+import time
+
+from app.utils.metrics import DB_READ_SESSIONS, DB_REPLICA_LAG, instrument_engine, request_queries
+from app.utils.rate_limit import load_monitor
 
 # SQLAlchemy database URL
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/library_db")
 
+# Async drivers used by the API for each sync driver family
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+
 # Create SQLAlchemy engine
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
@@ -17,6 +41,150 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API routes, so queries never block the event loop.
+# The sync engine above stays in place for Celery tasks and management commands.
+# (aiosqlite does not use a queue pool, so it gets no sizing options)
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    **({} if SQLALCHEMY_ASYNC_DATABASE_URL.startswith("sqlite") else {"pool_size": 10, "max_overflow": 20})
+)
+
+# Pool and query metrics for both engines
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+# Objects stay loaded after commit, since async sessions cannot lazy-load on attribute access
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Comma-separated read-replica URLs, in the same form as DATABASE_URL. Read-only
+# GET routes and reporting tasks use them; writes always go to the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# A replica further behind the primary than this is skipped until it catches up
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# How long a replica's measured lag (or outage) is trusted before checking again
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "2"))
+# Give up connecting to a replica after this long and read from the primary
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+
+# Seconds of WAL replay a Postgres standby is behind; 0 when it has replayed
+# everything it received (an idle primary is not lag) or is not a standby
+POSTGRES_REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def replica_lag_query(dialect_name: str):
+    # Other backends have no replication to measure; just check the connection
+    return POSTGRES_REPLICA_LAG if dialect_name == "postgresql" else text("SELECT 0")
+
+class Replica:
+    """
+    One read replica: its engines and sessionmakers, and its last measured
+    lag, which is shared by the sync and async sides and re-checked at most
+    every REPLICA_CHECK_INTERVAL seconds. A lag of None means unreachable.
+    """
+
+    def __init__(self, url: str, name: str, pool_size: int = 10, max_overflow: int = 20, with_async: bool = True):
+        self.url = url
+        self.name = name
+        backend = make_url(url).get_backend_name()
+        sync_timeout = {"connect_timeout": REPLICA_CONNECT_TIMEOUT} if backend == "postgresql" else {}
+        async_timeout = {"timeout": REPLICA_CONNECT_TIMEOUT} if backend == "postgresql" else {}
+        pool_options = {} if backend == "sqlite" else {"pool_size": pool_size, "max_overflow": max_overflow}
+
+        self.engine = create_engine(url, pool_pre_ping=True, connect_args=sync_timeout, **pool_options)
+        instrument_engine(self.engine, f"{name}-sync")
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        # Celery workers only read synchronously and skip the async side
+        self.async_engine = self.AsyncSessionLocal = None
+        if with_async:
+            self.async_engine = create_async_engine(
+                to_async_url(url), pool_pre_ping=True, connect_args=async_timeout, **pool_options
+            )
+            instrument_engine(self.async_engine.sync_engine, f"{name}-async")
+            self.AsyncSessionLocal = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+
+        # Assumed in sync until the first check, which runs before first use
+        self.lag: Optional[float] = 0.0
+        self.checked_at = float("-inf")
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    @property
+    def check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= REPLICA_CHECK_INTERVAL
+
+    def record(self, lag: Optional[float]):
+        was_usable = self.usable
+        self.lag = lag
+        self.checked_at = time.monotonic()
+        DB_REPLICA_LAG.labels(replica=self.name).set(-1 if lag is None else lag)
+        if was_usable and not self.usable:
+            state = "unreachable" if lag is None else f"{lag:.1f}s behind"
+            print(f"Read replica {self.name} is {state}; reading from the primary")
+        elif self.usable and not was_usable:
+            print(f"Read replica {self.name} is back in rotation")
+
+    def check(self):
+        # Mark the check as started, so concurrent callers keep the last verdict meanwhile
+        self.checked_at = time.monotonic()
+        token = request_queries.set(None)  # health checks are not the request's queries
+        try:
+            with self.engine.connect() as conn:
+                lag = conn.scalar(replica_lag_query(self.engine.dialect.name))
+            self.record(float(lag or 0))
+        except (SQLAlchemyError, OSError) as e:
+            print(f"Read replica {self.name} check failed: {str(e)}")
+            self.record(None)
+        finally:
+            request_queries.reset(token)
+
+    async def check_async(self):
+        self.checked_at = time.monotonic()
+        token = request_queries.set(None)
+        try:
+            async with self.async_engine.connect() as conn:
+                lag = await conn.scalar(replica_lag_query(self.async_engine.dialect.name))
+            self.record(float(lag or 0))
+        except (SQLAlchemyError, OSError) as e:
+            print(f"Read replica {self.name} check failed: {str(e)}")
+            self.record(None)
+        finally:
+            request_queries.reset(token)
+
+replicas: List[Replica] = [
+    Replica(url, f"replica{index}") for index, url in enumerate(DATABASE_REPLICA_URLS)
+]
+_next_replica = 0
+
+def _replica_order() -> List[Replica]:
+    # Round-robin: start each pick one replica further along
+    global _next_replica
+    start, _next_replica = _next_replica, (_next_replica + 1) % max(len(replicas), 1)
+    return replicas[start:] + replicas[:start]
+
+def pick_replica() -> Optional[Replica]:
+    """A replica within the lag limit, or None to read from the primary."""
+    for replica in _replica_order():
+        if replica.check_due:
+            replica.check()
+        if replica.usable:
+            return replica
+    return None
+
+async def pick_replica_async() -> Optional[Replica]:
+    for replica in _replica_order():
+        if replica.check_due:
+            await replica.check_async()
+        if replica.usable:
+            return replica
+    return None
+
 # Create Base class for declarative models
 Base = declarative_base()
 
@@ -28,7 +196,133 @@ def get_db() -> Session:
     finally:
         db.close()
 
-# Function to drop and recreate all tables (use carefully in production!)
+async def checkout_timed(db: AsyncSession):
+    """
+    Check out the session's connection up front, timing the wait for the
+    pool, which drives load shedding.
+    """
+    started = time.perf_counter()
+    await db.connection()
+    load_monitor.record_pool_wait(time.perf_counter() - started)
+
+# Dependency to get an async database session
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        await checkout_timed(db)
+        yield db
+
+# Session on a healthy read replica for read-only work (reporting tasks),
+# falling back to the primary: through the task's own session inside a
+# Celery worker, so reads share the worker process's pool
+def get_read_session() -> Session:
+    replica = pick_replica()
+    DB_READ_SESSIONS.labels(target=replica.name if replica else "primary").inc()
+    if replica is not None:
+        return replica.SessionLocal()
+    return TaskSession() if task_engine is not None else SessionLocal()
+
+# Dependency for read-only GET routes: a replica session when one is within
+# the lag limit, otherwise the primary. Routes that write caches from what
+# they read, or must see the caller's own writes, use get_async_db instead.
+async def get_async_read_db() -> AsyncSession:
+    replica = await pick_replica_async()
+    DB_READ_SESSIONS.labels(target=replica.name if replica else "primary").inc()
+    if replica is None:
+        async with AsyncSessionLocal() as db:
+            await checkout_timed(db)
+            yield db
+        return
+
+    async with replica.AsyncSessionLocal() as db:
+        try:
+            await checkout_timed(db)
+            yield db
+        except (OperationalError, InterfaceError):
+            # The replica went away mid-request; skip it until the next check
+            replica.record(None)
+            raise
+
+# Connection pool size of each Celery worker process, per queue it consumes,
+# as "queue=size,..."; a process consuming several queues gets the largest.
+# A prefork process runs one task at a time, so small pools suffice; raise
+# them to the concurrency when running the threads or gevent pool.
+CELERY_DB_POOL_SIZES = os.getenv("CELERY_DB_POOL_SIZES", "notifications=1,reports=2")
+# Extra connections a worker process may open beyond its pool size
+CELERY_DB_MAX_OVERFLOW = int(os.getenv("CELERY_DB_MAX_OVERFLOW", "2"))
+
+def parse_pool_sizes(spec: str) -> Dict[str, int]:
+    sizes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        queue, _, size = item.partition("=")
+        sizes[queue.strip()] = int(size)
+    return sizes
+
+celery_pool_sizes = parse_pool_sizes(CELERY_DB_POOL_SIZES)
+
+# Session for Celery tasks, one per task: bound to the worker process's own
+# engine once init_task_engines has run (on the primary engine before that,
+# e.g. for eagerly run tasks) and removed when the task finishes
+TaskSession = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+task_engine = None
+
+def task_pool_size(queues: Iterable[str]) -> int:
+    return max((celery_pool_sizes.get(queue, 1) for queue in queues), default=1)
+
+def init_task_engines(queues: Iterable[str]):
+    """
+    Give this worker process its own pooled engines, sized for the queues it
+    consumes. Called after the fork: pooled connections inherited from the
+    parent are dropped without closing them, since the parent owns those
+    sockets.
+    """
+    global task_engine
+    pool_size = task_pool_size(queues)
+    pool_options = {} if engine.dialect.name == "sqlite" else {
+        "pool_size": pool_size, "max_overflow": CELERY_DB_MAX_OVERFLOW
+    }
+
+    engine.dispose(close=False)
+    task_engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True, **pool_options)
+    instrument_engine(task_engine, "celery")
+    TaskSession.configure(bind=task_engine)
+
+    for index, replica in enumerate(replicas):
+        replica.engine.dispose(close=False)
+        if replica.async_engine is not None:
+            replica.async_engine.sync_engine.dispose(close=False)
+        replicas[index] = Replica(replica.url, replica.name, pool_size, CELERY_DB_MAX_OVERFLOW, with_async=False)
+    print(f"Worker process {os.getpid()} database pool: {pool_size} connections")
+
+def dispose_task_engines():
+    if task_engine is not None:
+        task_engine.dispose()
+    for replica in replicas:
+        replica.engine.dispose()
+
+def bind_celery_sessions(app):
+    """
+    Set up per-process engines in every Celery worker process and close each
+    task's TaskSession when the task finishes, whatever its outcome.
+    """
+    from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
+
+    @worker_process_init.connect(weak=False)
+    def on_worker_process_init(**kwargs):
+        # Queues picked with -Q; None means the worker consumes all of them
+        queues = app.amqp.queues.consume_from or app.amqp.queues
+        init_task_engines(list(queues))
+
+    @task_postrun.connect(weak=False)
+    def on_task_postrun(**kwargs):
+        TaskSession.remove()
+
+    @worker_process_shutdown.connect(weak=False)
+    def on_worker_process_shutdown(**kwargs):
+        dispose_task_engines()
+
+# Function to drop and recreate all tables (use carefully in production!).
+# Objects owned by the migrations, like the search indexes, are not created;
+# use `alembic upgrade head` for a complete schema.
 def recreate_database():
     from app.models import models  # Import models here to avoid circular imports
     
@@ -0,0 +1,28 @@
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database.database import engine
+from app.utils.catalog_import import BATCH_SIZE, SUPPORTED_FORMATS, detect_format, import_books
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import books from a CSV or NDJSON file, upserting on isbn')
+    parser.add_argument('path', help='CSV (title,author,isbn,quantity header) or NDJSON file to import')
+    parser.add_argument('--format', choices=SUPPORTED_FORMATS, help='Input format (default: guessed from the file extension)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows written per batch')
+    
+    args = parser.parse_args()
+    fmt = args.format or detect_format(filename=args.path)
+    
+    with open(args.path, 'rb') as f:
+        report = import_books(engine, f, fmt, batch_size=args.batch_size)
+    
+    print(f"Imported {report['imported']} books, {report['failed']} rows failed.")
+    for error in report['errors']:
+        print(f"  row {error['row']}: {error['error']}")
+    if report['failed'] > len(report['errors']):
+        print(f"  ... {report['failed'] - len(report['errors'])} more errors not shown")
+
+if __name__ == "__main__":
+    main()
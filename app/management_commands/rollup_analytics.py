@@ -0,0 +1,35 @@
+import argparse
+import sys
+import os
+from datetime import date
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database.database import SessionLocal
+from app.utils.analytics import ANALYTICS_ROLLUP_MAX_DAYS, rolled_up_through, rollup_pending_days
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Backfill the daily analytics rollups, e.g. over the existing history on a first deploy'
+    )
+    parser.add_argument('--until', type=date.fromisoformat, help='Last day to roll up, YYYY-MM-DD (default: yesterday, UTC)')
+    parser.add_argument('--max-days', type=int, help='Stop after rolling up this many days (default: no limit)')
+    parser.add_argument('--chunk-days', type=int, default=ANALYTICS_ROLLUP_MAX_DAYS, help='Days rolled up between progress reports')
+    
+    args = parser.parse_args()
+    db = SessionLocal()
+    
+    try:
+        total = 0
+        while args.max_days is None or total < args.max_days:
+            chunk = args.chunk_days if args.max_days is None else min(args.chunk_days, args.max_days - total)
+            days = rollup_pending_days(db, until=args.until, max_days=chunk)
+            if not days:
+                break
+            total += days
+            print(f"Rolled up {total} days, through {rolled_up_through(db)}")
+        print(f"Done: {total} days rolled up.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
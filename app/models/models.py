@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Date, DateTime, Boolean, Enum as SQLEnum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -12,6 +12,7 @@ class Book(Base):
     isbn = Column(String, unique=True, index=True)
     quantity = Column(Integer, default=1)
     available_quantity = Column(Integer, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     checkouts = relationship("Checkout", back_populates="book")
 
@@ -43,3 +44,51 @@ class Checkout(Base):
     
     book = relationship("Book", back_populates="checkouts")
     patron = relationship("Patron", back_populates="checkouts")
+
+    # Indexes matched to the hot query shapes: a patron's (open) checkouts,
+    # a book's or patron's checkout history, overdue/due-soon scans over open loans, and
+    # the date-range scans of reports and analytics rollups
+    __table_args__ = (
+        Index("ix_checkouts_patron_id_is_returned", "patron_id", "is_returned"),
+        Index("ix_checkouts_book_id_id", "book_id", "id"),
+        Index("ix_checkouts_patron_id_id", "patron_id", "id"),
+        Index(
+            "ix_checkouts_open_due_date", "due_date",
+            postgresql_where=text("is_returned = false"),
+            sqlite_where=text("is_returned = 0")
+        ),
+        Index("ix_checkouts_checkout_date", "checkout_date"),
+        Index(
+            "ix_checkouts_return_date", "return_date",
+            postgresql_where=text("return_date IS NOT NULL"),
+            sqlite_where=text("return_date IS NOT NULL")
+        ),
+    )
+
+# Daily analytics rollups
+# Filled one closed (UTC) day at a time by the nightly rollup task, so
+# analytics over any date range sum a few rows per day instead of
+# rescanning `checkouts`.
+class DailyCheckoutStats(Base):
+    __tablename__ = "daily_checkout_stats"
+
+    day = Column(Date, primary_key=True)
+    checkouts = Column(Integer, nullable=False, default=0)
+    # Returns, and the summed loan duration of the checkouts returned, on this day
+    returns = Column(Integer, nullable=False, default=0)
+    returned_duration_seconds = Column(BigInteger, nullable=False, default=0)
+    active_patrons = Column(Integer, nullable=False, default=0)
+
+class DailyBookCheckouts(Base):
+    __tablename__ = "daily_book_checkouts"
+
+    day = Column(Date, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    checkouts = Column(Integer, nullable=False, default=0)
+
+class DailyPatronActivity(Base):
+    __tablename__ = "daily_patron_activity"
+
+    day = Column(Date, primary_key=True)
+    patron_id = Column(Integer, ForeignKey("patrons.id", ondelete="CASCADE"), primary_key=True)
+    checkouts = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,52 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import get_async_read_db
+from app.models import models
+from app.schemas import schemas
+from app.utils.analytics import MAX_ANALYTICS_DAYS, daily_series, summarize
+from app.utils.auth import get_current_superuser
+from app.utils.query_budget import query_budget
+
+router = APIRouter()
+
+def resolve_range(start: Optional[date], end: Optional[date], default_days: int = 30) -> Tuple[date, date]:
+    """Default to the last `default_days` days, today included, and reject oversized ranges."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_ANALYTICS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date ranges are limited to {MAX_ANALYTICS_DAYS} days")
+    return start, end
+
+@router.get("/admin/analytics/summary", response_model=schemas.AnalyticsSummary)
+@query_budget(8)
+async def analytics_summary(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.Patron = Depends(get_current_superuser),
+):
+    """
+    Checkout totals, active patrons, average loan duration and the most
+    popular books between `start` and `end` (inclusive, UTC; the last 30
+    days by default), summed from the daily rollups.
+    """
+    start, end = resolve_range(start, end)
+    return await db.run_sync(summarize, start, end)
+
+@router.get("/admin/analytics/daily", response_model=List[schemas.DailyAnalytics])
+@query_budget(5)
+async def analytics_daily(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.Patron = Depends(get_current_superuser),
+):
+    """Per-day checkouts, returns and active patrons between `start` and `end`."""
+    start, end = resolve_range(start, end)
+    return await db.run_sync(daily_series, start, end)
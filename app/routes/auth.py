@@ -1,34 +1,46 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.database import get_db
+from app.database.database import get_async_db
 from app.models import models
 from app.schemas import schemas as user_schemas
 from app.utils.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     create_access_token,
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     get_current_active_user,
     get_current_superuser
 )
+from app.utils.principal_cache import principal_cache
+from app.utils.query_budget import query_budget
+from app.utils.rate_limit import rate_limit
 
 router = APIRouter()
 
 @router.post("/token", response_model=user_schemas.Token)
+@query_budget(2)
+@rate_limit("auth")
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.Patron).filter(models.Patron.email == form_data.email).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(models.Patron).where(models.Patron.email == form_data.username))
+    if user:
+        password_ok, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash used an old bcrypt cost; upgrade it while we have the password
+        user.hashed_password = new_hash
+        await db.commit()
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -38,15 +50,15 @@ async def login_for_access_token(
 @router.post("/users/", response_model=user_schemas.Patron)
 async def create_user(
     user: user_schemas.PatronCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.Patron = Depends(get_current_superuser)
 ):
-    db_user = db.query(models.Patron).filter(models.Patron.email == user.email).first()
+    db_user = await db.scalar(select(models.Patron).where(models.Patron.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.Patron(
         email=user.email,
         hashed_password=hashed_password,
@@ -54,11 +66,12 @@ async def create_user(
         is_superuser=user.is_superuser
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/users/me/", response_model=user_schemas.Patron)
+@query_budget(1)
 async def read_users_me(current_user: models.Patron = Depends(get_current_active_user)):
     return current_user
 
@@ -66,17 +79,27 @@ async def read_users_me(current_user: models.Patron = Depends(get_current_active
 async def update_user_me(
     user: user_schemas.PatronUpdate,
     current_user: models.Patron = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # The current user may come from the principal cache, detached from this session
+    db_current_user = await db.get(models.Patron, current_user.id)
+    old_email = db_current_user.email
+    
     if user.email:
-        db_user = db.query(models.Patron).filter(models.Patron.email == user.email).first()
-        if db_user and db_user.id != current_user.id:
+        db_user = await db.scalar(select(models.Patron).where(models.Patron.email == user.email))
+        if db_user and db_user.id != db_current_user.id:
             raise HTTPException(status_code=400, detail="Email already registered")
-        current_user.email = user.email
+        db_current_user.email = user.email
     
     if user.password:
-        current_user.hashed_password = get_password_hash(user.password)
+        db_current_user.hashed_password = await get_password_hash_async(user.password)
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    await db.commit()
+    await db.refresh(db_current_user)
+    await principal_cache.invalidate(old_email, db_current_user.email)
+    return db_current_user
+
+@router.get("/admin/principal-cache/stats")
+async def principal_cache_stats(current_user: models.Patron = Depends(get_current_superuser)):
+    """Hit/miss counters of this worker's principal cache."""
+    return principal_cache.stats()
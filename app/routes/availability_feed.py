@@ -0,0 +1,100 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.utils.availability_feed import AVAILABILITY_FEED_MAX_BOOKS, Subscriber, availability_hub
+from app.utils.metrics import AVAILABILITY_FEED_SUBSCRIBERS, AVAILABILITY_FEED_UPDATES
+
+router = APIRouter()
+
+# Comment line sent on idle event streams so proxies keep them open
+SSE_HEARTBEAT_SECONDS = 15
+
+def parse_book_ids(ids: Optional[str]) -> List[int]:
+    try:
+        return [int(book_id) for book_id in ids.split(",") if book_id.strip()] if ids else []
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of book ids")
+
+def availability_message(changes: Dict[int, Optional[int]]) -> str:
+    return json.dumps({"availability": {str(book_id): value for book_id, value in changes.items()}})
+
+async def send_changes(websocket: WebSocket, subscriber: Subscriber):
+    try:
+        while True:
+            changes = await subscriber.next_changes()
+            await websocket.send_text(availability_message(changes))
+            AVAILABILITY_FEED_UPDATES.labels(transport="websocket").inc()
+    except (WebSocketDisconnect, RuntimeError, OSError):
+        # The client went away; the receive loop cleans up
+        return
+
+@router.websocket("/ws/books/availability")
+async def availability_websocket(websocket: WebSocket, ids: Optional[str] = None):
+    """
+    Live availability for a set of books. Connect with `?ids=1,2,3` and/or
+    send `{"subscribe": [ids]}` / `{"unsubscribe": [ids]}`. The server sends
+    `{"availability": {"<book id>": copies}}` with the current values on
+    subscribe and again whenever they change (null once a book is deleted).
+    Changes that arrive faster than the client reads are merged per book.
+    """
+    await websocket.accept()
+    subscriber = Subscriber()
+    gauge = AVAILABILITY_FEED_SUBSCRIBERS.labels(transport="websocket")
+    gauge.inc()
+    sender = asyncio.create_task(send_changes(websocket, subscriber))
+    try:
+        try:
+            await availability_hub.subscribe(subscriber, parse_book_ids(ids))
+        except ValueError as e:
+            await websocket.send_text(json.dumps({"error": str(e)}))
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                if "subscribe" in message:
+                    await availability_hub.subscribe(subscriber, [int(book_id) for book_id in message["subscribe"]])
+                if "unsubscribe" in message:
+                    availability_hub.unsubscribe(subscriber, [int(book_id) for book_id in message["unsubscribe"]])
+            except (ValueError, TypeError, AttributeError) as e:
+                await websocket.send_text(json.dumps({"error": str(e) or "Invalid message"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        availability_hub.unsubscribe(subscriber)
+        gauge.dec()
+
+@router.get("/books/availability/stream")
+async def availability_event_stream(ids: List[int] = Query(..., max_length=AVAILABILITY_FEED_MAX_BOOKS)):
+    """
+    Server-Sent Events version of the availability feed for `ids`: an
+    `availability` event with the current values, then one per change.
+    """
+    subscriber = Subscriber()
+    try:
+        await availability_hub.subscribe(subscriber, ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        gauge = AVAILABILITY_FEED_SUBSCRIBERS.labels(transport="sse")
+        gauge.inc()
+        try:
+            while True:
+                changes = await subscriber.next_changes(timeout=SSE_HEARTBEAT_SECONDS)
+                if not changes:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: availability\ndata: {availability_message(changes)}\n\n"
+                AVAILABILITY_FEED_UPDATES.labels(transport="sse").inc()
+        finally:
+            availability_hub.unsubscribe(subscriber)
+            gauge.dec()
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
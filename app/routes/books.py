@@ -1,22 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database.database import get_db
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from app.database.database import engine, get_async_db, get_async_read_db
 from app.models import models
 from app.schemas import schemas
+from app.utils.availability import get_availability, remove_availability, set_availability
+from app.utils.catalog_import import SUPPORTED_FORMATS, detect_format, import_books
+from app.utils.checkout_history import CHECKOUTS_PAGE_SIZE, load_checkouts_page
+from app.utils.pagination import keyset_order, keyset_query, resolve_sort, split_page
+from app.utils.query_budget import query_budget
+from app.utils.response_cache import cache_key, etag_matches, make_etag, not_modified, response_cache
+from app.utils.search import build_book_search_query
+from app.utils.serialization import json_response, ndjson_response, row_dicts, schema_columns, schema_fields, wants_ndjson
 from app.utils.auth import (
-    get_db, 
-    get_current_active_user, 
-    admin_required, 
+    get_current_active_user,
+    get_current_superuser,
+    admin_required,
     normal_user_required
 )
 
 router = APIRouter()
 
 @router.post("/books/", response_model=schemas.Book)
+@query_budget(2)
 async def create_book(
-    book: schemas.BookCreate, 
-    db: Session = Depends(get_db),
+    book: schemas.BookCreate,
+    db: AsyncSession = Depends(get_async_db),
 ):
     db_book = models.Book(
         title=book.title,
@@ -26,55 +37,192 @@ async def create_book(
         available_quantity=book.quantity
     )
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    await db.refresh(db_book)
+    await set_availability({db_book.id: db_book.available_quantity})
     return db_book
 
-@router.get("/books/", response_model=List[schemas.Book])
+@router.post("/books/import", response_model=schemas.BookImportResult)
+async def import_books_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: models.Patron = Depends(get_current_superuser),
+):
+    """
+    Bulk create or update books from a CSV (title,author,isbn,quantity header)
+    or NDJSON upload, upserting on isbn. The upload is spooled to disk and
+    parsed row by row in a worker thread; rows are written in large batches
+    (COPY on Postgres). Invalid rows are skipped and listed in the report.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    return await run_in_threadpool(import_books, engine, file.file, fmt)
+
+BOOK_SORT_COLUMNS = {"id": None, "title": "title"}
+
+@router.get("/books/", response_model=Union[List[schemas.Book], schemas.BookPage])
+@query_budget(1)
 async def read_books(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    List books. Passing `cursor` (empty for the first page) switches to keyset
+    pagination and returns `{items, next_cursor}`; `skip`/`limit` keep working
+    for existing clients. Responds 304 when If-None-Match matches the page.
+    With `Accept: application/x-ndjson`, every book after `cursor` is
+    streamed instead, one JSON object per line.
+    """
+    fields = schema_fields(schemas.Book)
+    stmt = select(*schema_columns(models.Book, schemas.Book), models.Book.updated_at)
+    if wants_ndjson(request):
+        sort_column = resolve_sort(models.Book, sort, BOOK_SORT_COLUMNS)
+        return ndjson_response(db.bind, keyset_order(stmt, models.Book, cursor, sort_column), fields)
+
+    if cursor is None:
+        books = (await db.execute(stmt.offset(skip).limit(limit))).all()
+        next_cursor = None
+    else:
+        sort_column = resolve_sort(models.Book, sort, BOOK_SORT_COLUMNS)
+        rows = (await db.execute(
+            keyset_query(stmt, models.Book, cursor, limit, sort_column)
+        )).all()
+        books, next_cursor = split_page(rows, models.Book, limit, sort_column)
+
+    etag = make_etag("books", next_cursor, *((book.id, book.updated_at) for book in books))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    items = row_dicts(books, fields)
+    content = items if cursor is None else {"items": items, "next_cursor": next_cursor}
+    return json_response(content, headers={"ETag": etag})
+
+@router.get("/books/search", response_model=List[schemas.Book])
+@query_budget(1)
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    available: bool = False,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    books = db.query(models.Book).offset(skip).limit(limit).all()
-    return books
+    """
+    Ranked search over title, author and isbn. Set `available` to only
+    return books with copies on the shelf.
+    """
+    stmt = build_book_search_query(db.bind.dialect.name, q, available_only=available, limit=limit)
+    if stmt is None:
+        return []
+    return (await db.scalars(stmt)).all()
+
+@router.get("/books/availability", response_model=List[schemas.BookAvailability])
+@query_budget(1)
+async def read_books_availability(
+    ids: List[int] = Query(..., max_length=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Available copies for many books at once, served from the Redis
+    availability cache. Only books missing from the cache are read from the
+    database (and cached); unknown ids are left out of the response.
+    """
+    availability = await get_availability(ids)
+    missing = [book_id for book_id, available in availability.items() if available is None]
+    if missing:
+        rows = (await db.execute(
+            select(models.Book.id, models.Book.available_quantity).where(models.Book.id.in_(missing))
+        )).all()
+        loaded = {book_id: available for book_id, available in rows}
+        await set_availability(loaded)
+        availability.update(loaded)
+    return [
+        {"book_id": book_id, "available_quantity": available}
+        for book_id, available in availability.items()
+        if available is not None
+    ]
 
 @router.get("/books/{book_id}", response_model=schemas.BookWithCheckouts)
+@query_budget(3)
 async def read_book(
-    book_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    book_id: int,
+    checkouts_limit: int = CHECKOUTS_PAGE_SIZE,
+    checkouts_status: str = "all",
+    checkouts_cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if book is None:
+    """
+    Return a book with one page of its checkouts (`checkouts_limit`, at most
+    500), newest first, optionally only `active` or `returned` ones; follow
+    `checkouts_next_cursor` for older history.
+
+    Every checkout or return touches the book row, so its updated_at
+    versions the whole response, checkouts included. A matching
+    If-None-Match gets a 304 and an unchanged book is served from the
+    response cache, both after a single primary-key lookup.
+    """
+    version = (await db.execute(
+        select(models.Book.updated_at).where(models.Book.id == book_id)
+    )).first()
+    if version is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    etag = make_etag("book", book_id, request.url.query, version.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    key = cache_key(request)
+    body = response_cache.get(key, etag)
+    if body is None:
+        book = await db.get(models.Book, book_id)
+        if book is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        next_cursor = await load_checkouts_page(
+            db, book, models.Checkout.book_id, checkouts_status, checkouts_cursor, checkouts_limit
+        )
+        # Version the body by what was actually loaded, in case the row changed in between
+        etag = make_etag("book", book_id, request.url.query, book.updated_at)
+        body = schemas.BookWithCheckouts.model_validate(book).model_copy(
+            update={"checkouts_next_cursor": next_cursor}
+        ).model_dump_json().encode()
+        response_cache.put(key, etag, body, resource=f"book:{book_id}")
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.put("/books/{book_id}", response_model=schemas.Book)
+@query_budget(3)
 async def update_book(
-    book_id: int, 
-    book: schemas.BookCreate, 
-    db: Session = Depends(get_db),
+    book_id: int,
+    book: schemas.BookCreate,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    db_book = await db.get(models.Book, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    
+
     for var, value in vars(book).items():
         setattr(db_book, var, value)
-    
-    db.commit()
-    db.refresh(db_book)
+
+    await db.commit()
+    await db.refresh(db_book)
+    await set_availability({db_book.id: db_book.available_quantity})
+    response_cache.invalidate(f"book:{book_id}")
     return db_book
 
 @router.delete("/books/{book_id}")
+@query_budget(4)
 async def delete_book(
-    book_id: int, 
-    db: Session = Depends(get_db),
+    book_id: int,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    db_book = await db.get(models.Book, book_id)
     if db_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    
-    db.delete(db_book)
-    db.commit()
+
+    await db.delete(db_book)
+    await db.commit()
+    await remove_availability(book_id)
+    response_cache.invalidate(f"book:{book_id}")
     return {"message": "Book deleted successfully"}
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
-from app.database.database import get_db
+from app.database.database import get_async_db, get_async_read_db
 from app.models import models
 from app.schemas import schemas
+from app.utils.availability import apply_availability_delta, apply_availability_deltas
+from app.utils.checkout_history import touch_patron
+from app.utils.inventory import put_back_copies, put_back_copy, take_copies, take_copy
+from app.utils.pagination import keyset_order, keyset_query, resolve_sort, split_page
+from app.utils.query_budget import query_budget
+from app.utils.response_cache import response_cache
+from app.utils.serialization import json_response, ndjson_response, row_dicts, schema_columns, schema_fields, wants_ndjson
 from app.utils.auth import (
     get_current_active_user, 
     normal_user_required, 
@@ -13,16 +23,26 @@ from app.utils.auth import (
 
 router = APIRouter()
 
+# Most items one batch checkout or return may carry (a kiosk scans 5-15)
+MAX_BATCH_ITEMS = 50
+
+def check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="A batch needs at least one item")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batches are limited to {MAX_BATCH_ITEMS} items")
+
 @router.post("/checkouts/", response_model=schemas.Checkout)
+@query_budget(3)
 async def checkout_book(
     checkout: schemas.CheckoutCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    # Check if book exists and is available
-    book = db.query(models.Book).filter(models.Book.id == checkout.book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if book.available_quantity <= 0:
+    # Take a copy off the shelf; the conditional update fails if none are left
+    available_quantity = await take_copy(db, checkout.book_id)
+    if available_quantity is None:
+        if await db.get(models.Book, checkout.book_id) is None:
+            raise HTTPException(status_code=404, detail="Book not found")
         raise HTTPException(status_code=400, detail="Book is not available")
     
     # Create checkout record
@@ -32,68 +52,269 @@ async def checkout_book(
         due_date=checkout.due_date or datetime.utcnow() + timedelta(days=14)
     )
     
-    # Update book availability
-    book.available_quantity -= 1
-    
     db.add(db_checkout)
-    db.commit()
-    db.refresh(db_checkout)
+    await touch_patron(db, checkout.patron_id)
+    await db.commit()
+    await apply_availability_delta(checkout.book_id, -1, available_quantity)
+    response_cache.invalidate(f"book:{checkout.book_id}", f"patron:{checkout.patron_id}")
     return db_checkout
 
+# The batch routes are registered before /checkouts/{checkout_id}/return,
+# which would otherwise match /checkouts/batch/return
+
+@router.post("/checkouts/batch", response_model=schemas.CheckoutBatchResult)
+@query_budget(4)
+async def checkout_books_batch(
+    batch: schemas.CheckoutBatchCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Check out a stack of books for one patron in a single transaction: one
+    conditional UPDATE takes the copies of every book and one multi-row
+    INSERT creates the checkouts. Results are reported per item, in request
+    order. If any item fails, nothing is checked out and the response is a
+    409, unless `atomic` is false, in which case the other items are kept.
+    """
+    check_batch_size(batch.book_ids)
+    counts = Counter(batch.book_ids)
+    remaining = await take_copies(db, counts)
+
+    failures = {}
+    missing = [book_id for book_id in counts if book_id not in remaining]
+    if missing:
+        available = dict((await db.execute(
+            select(models.Book.id, models.Book.available_quantity).where(models.Book.id.in_(missing))
+        )).all())
+        for book_id in missing:
+            if book_id not in available:
+                failures[book_id] = ("not_found", "Book not found")
+            else:
+                failures[book_id] = (
+                    "unavailable", f"{counts[book_id]} requested, {available[book_id]} available"
+                )
+
+    checkouts = []
+    committed = bool(remaining) and not (failures and batch.atomic)
+    if committed:
+        due_date = batch.due_date or datetime.utcnow() + timedelta(days=14)
+        try:
+            checkouts = (await db.scalars(
+                insert(models.Checkout).returning(models.Checkout),
+                [
+                    {"book_id": book_id, "patron_id": batch.patron_id, "due_date": due_date}
+                    for book_id in batch.book_ids if book_id in remaining
+                ]
+            )).all()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Patron not found")
+        await touch_patron(db, batch.patron_id)
+        await db.commit()
+        await apply_availability_deltas({
+            book_id: (-counts[book_id], available_quantity)
+            for book_id, available_quantity in remaining.items()
+        })
+        response_cache.invalidate(*(f"book:{book_id}" for book_id in remaining), f"patron:{batch.patron_id}")
+    else:
+        await db.rollback()
+
+    # RETURNING order is not guaranteed across backends, so match by book
+    created = {}
+    for db_checkout in checkouts:
+        created.setdefault(db_checkout.book_id, []).append(db_checkout)
+    items = []
+    for book_id in batch.book_ids:
+        if book_id in failures:
+            status, detail = failures[book_id]
+            items.append({"book_id": book_id, "status": status, "detail": detail})
+        elif committed:
+            items.append({"book_id": book_id, "status": "checked_out", "checkout": created[book_id].pop()})
+        else:
+            items.append({"book_id": book_id, "status": "skipped", "detail": "Batch rolled back"})
+
+    if failures and batch.atomic:
+        response.status_code = 409
+    return {
+        "committed": committed,
+        "succeeded": len(checkouts),
+        "failed": sum(1 for item in items if item["book_id"] in failures),
+        "items": items,
+    }
+
+@router.post("/checkouts/batch/return", response_model=schemas.ReturnBatchResult)
+@query_budget(4)
+async def return_books_batch(
+    batch: schemas.ReturnBatchCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Return several of a patron's checkouts in a single transaction: one
+    UPDATE closes the open checkouts and one UPDATE puts the copies back.
+    Failed items make the whole batch a 409 no-op unless `atomic` is false.
+    """
+    check_batch_size(batch.checkout_ids)
+    if len(set(batch.checkout_ids)) != len(batch.checkout_ids):
+        raise HTTPException(status_code=400, detail="Duplicate checkout ids")
+
+    # Only still-open checkouts are closed, as in return_book
+    returned = dict((await db.execute(
+        update(models.Checkout)
+        .where(
+            models.Checkout.id.in_(batch.checkout_ids),
+            models.Checkout.patron_id == batch.patron_id,
+            models.Checkout.is_returned == False
+        )
+        .values(is_returned=True, return_date=datetime.utcnow())
+        .returning(models.Checkout.id, models.Checkout.book_id)
+        .execution_options(synchronize_session=False)
+    )).all())
+
+    failures = {}
+    missing = [checkout_id for checkout_id in batch.checkout_ids if checkout_id not in returned]
+    if missing:
+        existing = set(await db.scalars(select(models.Checkout.id).where(
+            models.Checkout.id.in_(missing),
+            models.Checkout.patron_id == batch.patron_id
+        )))
+        for checkout_id in missing:
+            if checkout_id in existing:
+                failures[checkout_id] = ("already_returned", "Book already returned")
+            else:
+                failures[checkout_id] = ("not_found", "Checkout record not found or not authorized")
+
+    committed = bool(returned) and not (failures and batch.atomic)
+    if committed:
+        counts = Counter(returned.values())
+        available = await put_back_copies(db, counts)
+        await touch_patron(db, batch.patron_id)
+        await db.commit()
+        await apply_availability_deltas({
+            book_id: (counts[book_id], available_quantity)
+            for book_id, available_quantity in available.items()
+        })
+        response_cache.invalidate(*(f"book:{book_id}" for book_id in counts), f"patron:{batch.patron_id}")
+    else:
+        await db.rollback()
+
+    items = []
+    for checkout_id in batch.checkout_ids:
+        if checkout_id in failures:
+            status, detail = failures[checkout_id]
+            items.append({"checkout_id": checkout_id, "status": status, "detail": detail})
+        elif committed:
+            items.append({"checkout_id": checkout_id, "status": "returned", "book_id": returned[checkout_id]})
+        else:
+            items.append({
+                "checkout_id": checkout_id, "status": "skipped",
+                "book_id": returned[checkout_id], "detail": "Batch rolled back"
+            })
+
+    if failures and batch.atomic:
+        response.status_code = 409
+    return {
+        "committed": committed,
+        "succeeded": len(returned) if committed else 0,
+        "failed": len(failures),
+        "items": items,
+    }
+
 @router.post("/checkouts/{checkout_id}/return")
+@query_budget(3)
 async def return_book(
     checkout_id: int,
     patron_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    checkout = db.query(models.Checkout).filter(
-        models.Checkout.id == checkout_id,
-        models.Checkout.patron_id == patron_id
-    ).first()
-    
-    if not checkout:
-        raise HTTPException(status_code=404, detail="Checkout record not found or not authorized")
+    # Mark the checkout returned only if it is still open, so concurrent
+    # returns of the same checkout cannot put back two copies
+    book_id = await db.scalar(
+        update(models.Checkout)
+        .where(
+            models.Checkout.id == checkout_id,
+            models.Checkout.patron_id == patron_id,
+            models.Checkout.is_returned == False
+        )
+        .values(is_returned=True, return_date=datetime.utcnow())
+        .returning(models.Checkout.book_id)
+        .execution_options(synchronize_session=False)
+    )
     
-    if checkout.is_returned:
+    if book_id is None:
+        checkout = await db.scalar(select(models.Checkout).where(
+            models.Checkout.id == checkout_id,
+            models.Checkout.patron_id == patron_id
+        ))
+        if not checkout:
+            raise HTTPException(status_code=404, detail="Checkout record not found or not authorized")
         raise HTTPException(status_code=400, detail="Book already returned")
     
-    # Update checkout record
-    checkout.is_returned = True
-    checkout.return_date = datetime.utcnow()
-    
     # Update book availability
-    book = db.query(models.Book).filter(models.Book.id == checkout.book_id).first()
-    book.available_quantity += 1
+    available_quantity = await put_back_copy(db, book_id)
+    await touch_patron(db, patron_id)
     
-    db.commit()
-    db.refresh(checkout)
+    await db.commit()
+    await apply_availability_delta(book_id, 1, available_quantity)
+    response_cache.invalidate(f"book:{book_id}", f"patron:{patron_id}")
     return {"message": "Book returned successfully"}
 
-@router.get("/admin/checkouts/all", response_model=List[schemas.Checkout])
+CHECKOUT_SORT_COLUMNS = {"id": None, "checkout_date": "checkout_date", "due_date": "due_date"}
+
+@router.get("/admin/checkouts/all", response_model=Union[List[schemas.Checkout], schemas.CheckoutPage])
+@query_budget(2)
 @admin_required
 async def admin_list_all_checkouts(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.Patron = Depends(get_current_active_user),
 ):
     """
     Admin endpoint to list all checkouts across all patrons.
-    Supports pagination via skip and limit parameters.
+    Supports pagination via skip and limit parameters, or keyset pagination
+    via cursor (empty for the first page), which stays fast on deep pages.
+    With `Accept: application/x-ndjson` every checkout after `cursor` is
+    streamed as one JSON object per line, for exports of any size.
     """
-    checkouts = db.query(models.Checkout).offset(skip).limit(limit).all()
-    return checkouts
+    fields = schema_fields(schemas.Checkout)
+    stmt = select(*schema_columns(models.Checkout, schemas.Checkout))
+    if wants_ndjson(request):
+        sort_column = resolve_sort(models.Checkout, sort, CHECKOUT_SORT_COLUMNS)
+        return ndjson_response(db.bind, keyset_order(stmt, models.Checkout, cursor, sort_column), fields)
+
+    if cursor is None:
+        checkouts = (await db.execute(stmt.offset(skip).limit(limit))).all()
+        return json_response(row_dicts(checkouts, fields))
+
+    sort_column = resolve_sort(models.Checkout, sort, CHECKOUT_SORT_COLUMNS)
+    rows = (await db.execute(
+        keyset_query(stmt, models.Checkout, cursor, limit, sort_column)
+    )).all()
+    checkouts, next_cursor = split_page(rows, models.Checkout, limit, sort_column)
+    return json_response({"items": row_dicts(checkouts, fields), "next_cursor": next_cursor})
 
 @router.get("/admin/checkouts/overdue", response_model=List[schemas.Checkout])
+@query_budget(2)
 @admin_required
 async def admin_list_all_overdue_checkouts(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.Patron = Depends(get_current_active_user),
 ):
     """
     Admin endpoint to list all overdue checkouts across all patrons.
+    Streams NDJSON with `Accept: application/x-ndjson`.
     """
     current_time = datetime.utcnow()
-    overdue_checkouts = db.query(models.Checkout).filter(
+    fields = schema_fields(schemas.Checkout)
+    stmt = select(*schema_columns(models.Checkout, schemas.Checkout)).where(
         models.Checkout.due_date < current_time,
         models.Checkout.is_returned == False
-    ).all()
-    return overdue_checkouts
+    )
+    if wants_ndjson(request):
+        return ndjson_response(db.bind, stmt.order_by(models.Checkout.id), fields)
+    return json_response(row_dicts((await db.execute(stmt)).all(), fields))
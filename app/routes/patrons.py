@@ -1,58 +1,138 @@
-from app.utils.auth import get_password_hash
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database.database import get_db
+from app.utils.auth import get_password_hash_async
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from app.database.database import get_async_db, get_async_read_db
 from app.models import models
 from app.schemas import schemas
+from app.utils.checkout_history import CHECKOUTS_PAGE_SIZE, load_checkouts_page
+from app.utils.pagination import keyset_order, keyset_query, resolve_sort, split_page
+from app.utils.principal_cache import principal_cache
+from app.utils.query_budget import query_budget
+from app.utils.response_cache import cache_key, etag_matches, make_etag, not_modified, response_cache
+from app.utils.serialization import json_response, ndjson_response, row_dicts, schema_columns, schema_fields, wants_ndjson
 
 router = APIRouter()
 
 @router.post("/patrons/", response_model=schemas.Patron)
-def create_patron(patron: schemas.PatronCreate, db: Session = Depends(get_db)):
+@query_budget(3)
+async def create_patron(patron: schemas.PatronCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if the email is already registered
-    db_patron = db.query(models.Patron).filter(models.Patron.email == patron.email).first()
+    db_patron = await db.scalar(select(models.Patron).where(models.Patron.email == patron.email))
     if db_patron:
         raise HTTPException(status_code=409, detail="Email already registered")
     
-    hashed_password = get_password_hash(patron.password)
+    hashed_password = await get_password_hash_async(patron.password)
     db_patron = models.Patron(name=patron.name, email=patron.email, hashed_password=hashed_password)
     db.add(db_patron)
-    db.commit()
-    db.refresh(db_patron)
+    await db.commit()
+    await db.refresh(db_patron)
     return db_patron
 
-@router.get("/patrons/", response_model=List[schemas.Patron])
-def read_patrons(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    patrons = db.query(models.Patron).offset(skip).limit(limit).all()
-    return patrons
+PATRON_SORT_COLUMNS = {"id": None, "name": "name"}
+
+@router.get("/patrons/", response_model=Union[List[schemas.Patron], schemas.PatronPage])
+@query_budget(1)
+async def read_patrons(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    fields = schema_fields(schemas.Patron)
+    stmt = select(*schema_columns(models.Patron, schemas.Patron))
+    if wants_ndjson(request):
+        sort_column = resolve_sort(models.Patron, sort, PATRON_SORT_COLUMNS)
+        return ndjson_response(db.bind, keyset_order(stmt, models.Patron, cursor, sort_column), fields)
+
+    if cursor is None:
+        patrons = (await db.execute(stmt.offset(skip).limit(limit))).all()
+        return json_response(row_dicts(patrons, fields))
+
+    sort_column = resolve_sort(models.Patron, sort, PATRON_SORT_COLUMNS)
+    rows = (await db.execute(
+        keyset_query(stmt, models.Patron, cursor, limit, sort_column)
+    )).all()
+    patrons, next_cursor = split_page(rows, models.Patron, limit, sort_column)
+    return json_response({"items": row_dicts(patrons, fields), "next_cursor": next_cursor})
 
 @router.get("/patrons/{patron_id}", response_model=schemas.PatronWithCheckouts)
-def read_patron(patron_id: int, db: Session = Depends(get_db)):
-    patron = db.query(models.Patron).filter(models.Patron.id == patron_id).first()
-    if patron is None:
+@query_budget(3)
+async def read_patron(
+    request: Request,
+    patron_id: int,
+    checkouts_limit: int = CHECKOUTS_PAGE_SIZE,
+    checkouts_status: str = "all",
+    checkouts_cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Return a patron with one page of their checkouts, paged and filtered
+    like the checkouts of `GET /books/{book_id}`.
+
+    Every checkout or return bumps the patron's updated_at, so it versions
+    the whole response, checkouts included. A matching If-None-Match gets a
+    304 and an unchanged patron is served from the response cache, both
+    after a single primary-key lookup.
+    """
+    version = (await db.execute(
+        select(models.Patron.updated_at).where(models.Patron.id == patron_id)
+    )).first()
+    if version is None:
         raise HTTPException(status_code=404, detail="Patron not found")
-    return patron
+    etag = make_etag("patron", patron_id, request.url.query, version.updated_at)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    key = cache_key(request)
+    body = response_cache.get(key, etag)
+    if body is None:
+        patron = await db.get(models.Patron, patron_id)
+        if patron is None:
+            raise HTTPException(status_code=404, detail="Patron not found")
+        next_cursor = await load_checkouts_page(
+            db, patron, models.Checkout.patron_id, checkouts_status, checkouts_cursor, checkouts_limit
+        )
+        # Version the body by what was actually loaded, in case the row changed in between
+        etag = make_etag("patron", patron_id, request.url.query, patron.updated_at)
+        body = schemas.PatronWithCheckouts.model_validate(patron).model_copy(
+            update={"checkouts_next_cursor": next_cursor}
+        ).model_dump_json().encode()
+        response_cache.put(key, etag, body, resource=f"patron:{patron_id}")
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.put("/patrons/{patron_id}", response_model=schemas.Patron)
-def update_patron(patron_id: int, patron: schemas.PatronCreate, db: Session = Depends(get_db)):
-    db_patron = db.query(models.Patron).filter(models.Patron.id == patron_id).first()
+@query_budget(3)
+async def update_patron(patron_id: int, patron: schemas.PatronCreate, db: AsyncSession = Depends(get_async_db)):
+    db_patron = await db.get(models.Patron, patron_id)
     if db_patron is None:
         raise HTTPException(status_code=404, detail="Patron not found")
+    old_email = db_patron.email
     
     for var, value in vars(patron).items():
-        setattr(db_patron, var, value)
+        if var == "password":
+            db_patron.hashed_password = await get_password_hash_async(value)
+        else:
+            setattr(db_patron, var, value)
     
-    db.commit()
-    db.refresh(db_patron)
+    await db.commit()
+    await db.refresh(db_patron)
+    await principal_cache.invalidate(old_email, db_patron.email)
+    response_cache.invalidate(f"patron:{patron_id}")
     return db_patron
 
 @router.delete("/patrons/{patron_id}")
-def delete_patron(patron_id: int, db: Session = Depends(get_db)):
-    db_patron = db.query(models.Patron).filter(models.Patron.id == patron_id).first()
+@query_budget(4)
+async def delete_patron(patron_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_patron = await db.get(models.Patron, patron_id)
     if db_patron is None:
         raise HTTPException(status_code=404, detail="Patron not found")
     
-    db.delete(db_patron)
-    db.commit()
+    await db.delete(db_patron)
+    await db.commit()
+    await principal_cache.invalidate(db_patron.email)
+    response_cache.invalidate(f"patron:{patron_id}")
     return {"message": "Patron deleted successfully"}
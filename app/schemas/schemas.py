@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 
 # Book Schemas
@@ -19,11 +19,18 @@ class Book(BookBase):
     class Config:
         from_attributes = True
 
+class BookAvailability(BaseModel):
+    book_id: int
+    available_quantity: int
+
 # Token Schema
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class TokenData(BaseModel):
+    email: Optional[str] = None
+
 # Patron Schemas
 class PatronBase(BaseModel):
     name: str
@@ -64,9 +71,95 @@ class Checkout(CheckoutBase):
     class Config:
         from_attributes = True
 
+# Batch Checkout Schemas
+class CheckoutBatchCreate(BaseModel):
+    patron_id: int
+    # The same book may appear more than once to take several copies
+    book_ids: List[int]
+    due_date: Optional[datetime] = None
+    # All-or-nothing by default; with atomic=False the items that can go through are kept
+    atomic: bool = True
+
+class CheckoutBatchItem(BaseModel):
+    book_id: int
+    status: str
+    detail: Optional[str] = None
+    checkout: Optional[Checkout] = None
+
+class CheckoutBatchResult(BaseModel):
+    committed: bool
+    succeeded: int
+    failed: int
+    items: List[CheckoutBatchItem]
+
+class ReturnBatchCreate(BaseModel):
+    patron_id: int
+    checkout_ids: List[int]
+    atomic: bool = True
+
+class ReturnBatchItem(BaseModel):
+    checkout_id: int
+    status: str
+    book_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class ReturnBatchResult(BaseModel):
+    committed: bool
+    succeeded: int
+    failed: int
+    items: List[ReturnBatchItem]
+
 # Response Schemas
 class BookWithCheckouts(Book):
     checkouts: List[Checkout] = []
+    checkouts_next_cursor: Optional[str] = None
 
 class PatronWithCheckouts(Patron):
     checkouts: List[Checkout] = []
+    checkouts_next_cursor: Optional[str] = None
+
+# Cursor Pagination Schemas
+class BookPage(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
+class PatronPage(BaseModel):
+    items: List[Patron]
+    next_cursor: Optional[str] = None
+
+class CheckoutPage(BaseModel):
+    items: List[Checkout]
+    next_cursor: Optional[str] = None
+
+# Bulk Import Schemas
+class BookImportError(BaseModel):
+    row: int
+    error: str
+
+class BookImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[BookImportError] = []
+
+# Analytics Schemas
+class PopularBook(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    checkouts: int
+
+class AnalyticsSummary(BaseModel):
+    start: date
+    end: date
+    total_checkouts: int
+    total_returns: int
+    active_patrons: int
+    average_checkout_duration_days: float
+    overdue_books: int
+    most_popular_books: List[PopularBook] = []
+
+class DailyAnalytics(BaseModel):
+    day: date
+    checkouts: int
+    returns: int
+    active_patrons: int
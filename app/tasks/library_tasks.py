@@ -1,142 +1,203 @@
 import os
 from datetime import datetime, timedelta
-import pandas as pd
-from sqlalchemy import create_engine, func, case
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import func, case, select, and_
 import asyncio
 
 from celery_worker import celery
 from app.models.models import Book, Patron, Checkout
-from app.utils.email import send_email
-from app.database.database import SQLALCHEMY_DATABASE_URL
+from app.utils.analytics import rollup_pending_days, summarize
+from app.utils.availability import reconcile_availability
+from app.utils.email import build_messages, send_many
+from app.utils.reports import write_report, write_xlsx
+from app.database.database import TaskSession, get_read_session
 
-def get_db_session():
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+# Patrons per notice subtask
+NOTICE_CHUNK_SIZE = int(os.getenv("NOTICE_CHUNK_SIZE", "200"))
+# Rows fetched per round trip from the server-side cursor
+NOTICE_FETCH_SIZE = 1000
+
+# Weekly report output: xlsx, csv or parquet
+WEEKLY_REPORT_FORMAT = os.getenv("WEEKLY_REPORT_FORMAT", "xlsx")
+# Report columns and their types, which Parquet needs up front: a batch where
+# no book was returned yet has nothing to infer return_date's type from
+WEEKLY_REPORT_COLUMNS = {
+    "book_title": "string",
+    "book_author": "string",
+    "patron_name": "string",
+    "checkout_date": "timestamp",
+    "due_date": "timestamp",
+    "is_returned": "bool",
+    "return_date": "timestamp",
+}
+# Rows fetched per round trip when streaming report queries
+REPORT_FETCH_SIZE = 2000
+
+def stream_notice_rows(db, *filters):
+    """
+    Stream the checkouts matching `filters` joined with their patron and
+    book, ordered by patron, through a server-side cursor.
+    """
+    return db.execute(
+        select(
+            Checkout.patron_id,
+            Patron.name,
+            Patron.email,
+            Book.title,
+            Book.author,
+            Checkout.due_date
+        )
+        .join(Patron, Patron.id == Checkout.patron_id)
+        .join(Book, Book.id == Checkout.book_id)
+        .where(*filters)
+        .order_by(Checkout.patron_id, Checkout.due_date)
+        .execution_options(yield_per=NOTICE_FETCH_SIZE)
+    )
+
+def iter_notice_chunks(rows, build_book, chunk_size=NOTICE_CHUNK_SIZE):
+    """
+    Group patron-ordered notice rows into one JSON-serializable notice per
+    patron, yielded in chunks of `chunk_size` patrons.
+    """
+    chunk, notice = [], None
+    for row in rows:
+        if notice is None or notice["patron_id"] != row.patron_id:
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+            notice = {
+                "patron_id": row.patron_id,
+                "patron_name": row.name,
+                "email": row.email,
+                "books": []
+            }
+            chunk.append(notice)
+        notice["books"].append(build_book(row))
+    if chunk:
+        yield chunk
+
+def with_due_dates(books):
+    """Restore the datetime due dates that were serialized for the subtask message."""
+    return [dict(book, due_date=datetime.fromisoformat(book["due_date"])) for book in books]
 
 @celery.task
 def send_overdue_notices():
     print("Starting overdue notices task (these should run each minute)..")
-    db = get_db_session()
+    db = get_read_session()
     current_time = datetime.utcnow()
     print(f"Current time: {current_time}")
     
     try:
-        # Get all overdue checkouts
+        # One joined query for every overdue checkout, streamed patron by patron
         print("Querying overdue checkouts...")
-        overdue_checkouts = (
-            db.query(Checkout)
-            .filter(
-                Checkout.due_date < current_time,
-                Checkout.is_returned == False
-            )
-            .all()
+        rows = stream_notice_rows(
+            db,
+            Checkout.due_date < current_time,
+            Checkout.is_returned == False
         )
-        print(f"Found {len(overdue_checkouts)} overdue checkouts")
-        
-        # Group checkouts by patron
-        patron_checkouts = {}
-        for checkout in overdue_checkouts:
-            if checkout.patron_id not in patron_checkouts:
-                patron_checkouts[checkout.patron_id] = []
-            patron_checkouts[checkout.patron_id].append(checkout)
-        print(f"Grouped checkouts for {len(patron_checkouts)} patrons")
         
-        # Send emails to each patron
-        for patron_id, checkouts in patron_checkouts.items():
-            print(f"Processing patron {patron_id}...")
-            patron = db.query(Patron).filter(Patron.id == patron_id).first()
-            if not patron:
-                print(f"Patron {patron_id} not found, skipping...")
-                continue
-                
-            overdue_books = []
-            for checkout in checkouts:
-                book = db.query(Book).filter(Book.id == checkout.book_id).first()
-                if book:
-                    days_overdue = (current_time - checkout.due_date).days
-                    overdue_books.append({
-                        "title": book.title,
-                        "author": book.author,
-                        "due_date": checkout.due_date,
-                        "days_overdue": days_overdue
-                    })
-            
-            # Send email asynchronously
-            template_data = {
-                "patron_name": patron.name,
-                "overdue_books": overdue_books
+        def overdue_book(row):
+            return {
+                "title": row.title,
+                "author": row.author,
+                "due_date": row.due_date.isoformat(),
+                "days_overdue": (current_time - row.due_date).days
             }
-            
-            print(f"Sending email to {patron.email}...")
-            asyncio.run(send_email(
-                to_email=patron.email,
-                subject="Library Books Overdue Notice",
-                template_name="overdue_notice",
-                template_data=template_data
-            ))
-            print(f"Email sent to {patron.email}")
+        
+        # Fan each chunk of patrons out to a subtask, so several workers share the sending
+        patrons, chunks = 0, 0
+        for chunk in iter_notice_chunks(rows, overdue_book):
+            send_overdue_notice_batch.delay(chunk)
+            patrons += len(chunk)
+            chunks += 1
+        print(f"Queued overdue notices for {patrons} patrons in {chunks} batches")
+        return patrons
             
     finally:
         db.close()
         print("Overdue notices task completed")
 
 @celery.task
-def generate_weekly_report():
+def send_overdue_notice_batch(notices):
+    """Send overdue notices for one chunk of patrons queued by send_overdue_notices."""
+    messages = build_messages(
+        subject="Library Books Overdue Notice",
+        template_name="overdue_notice",
+        payloads=[
+            {
+                "to_email": notice["email"],
+                "template_data": {
+                    "patron_name": notice["patron_name"],
+                    "overdue_books": with_due_dates(notice["books"])
+                }
+            }
+            for notice in notices
+        ]
+    )
+    
+    # One event loop and one pool of SMTP connections for the whole chunk
+    results = asyncio.run(send_many(messages))
+    return sum(results)
+
+@celery.task
+def generate_weekly_report(output_format=None):
     print("Starting weekly report task...")
-    db = get_db_session()
+    db = get_read_session()
     current_time = datetime.utcnow()
     week_ago = current_time - timedelta(days=7)
+    output_format = output_format or WEEKLY_REPORT_FORMAT
     
     try:
-        # Get checkout statistics
+        # Checkout statistics straight from SQL aggregates
         print("Querying checkout statistics...")
-        checkouts = (
-            db.query(Checkout)
-            .filter(Checkout.checkout_date >= week_ago)
-            .all()
-        )
-        print(f"Found {len(checkouts)} checkouts")
+        total, returned, overdue = db.execute(
+            select(
+                func.count(Checkout.id),
+                func.coalesce(func.sum(case((Checkout.is_returned == True, 1), else_=0)), 0),
+                func.coalesce(func.sum(case(
+                    (and_(Checkout.is_returned == False, Checkout.due_date < current_time), 1),
+                    else_=0
+                )), 0)
+            ).where(Checkout.checkout_date >= week_ago)
+        ).one()
+        print(f"Found {total} checkouts")
         
-        # Prepare data for the report
-        checkout_data = []
-        for checkout in checkouts:
-            book = db.query(Book).filter(Book.id == checkout.book_id).first()
-            patron = db.query(Patron).filter(Patron.id == checkout.patron_id).first()
-            
-            if book and patron:
-                checkout_data.append({
-                    "book_title": book.title,
-                    "book_author": book.author,
-                    "patron_name": patron.name,
-                    "checkout_date": checkout.checkout_date,
-                    "due_date": checkout.due_date,
-                    "is_returned": checkout.is_returned,
-                    "return_date": checkout.return_date
-                })
+        statistics = [
+            ("Total Checkouts", total),
+            ("Books Returned", returned),
+            ("Books Outstanding", total - returned),
+            ("Overdue Books", overdue)
+        ]
         
-        # Create DataFrame and generate Excel report
-        df = pd.DataFrame(checkout_data)
+        # One joined query, streamed in batches and written row by row
+        rows = db.execute(
+            select(
+                Book.title,
+                Book.author,
+                Patron.name,
+                Checkout.checkout_date,
+                Checkout.due_date,
+                Checkout.is_returned,
+                Checkout.return_date
+            )
+            .join(Book, Book.id == Checkout.book_id)
+            .join(Patron, Patron.id == Checkout.patron_id)
+            .where(Checkout.checkout_date >= week_ago)
+            .order_by(Checkout.id)
+            .execution_options(yield_per=REPORT_FETCH_SIZE)
+        )
         
         # Create reports directory if it doesn't exist
         reports_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports")
         os.makedirs(reports_dir, exist_ok=True)
         
         # Save report
-        report_path = os.path.join(reports_dir, f"weekly_report_{current_time.strftime('%Y%m%d')}.xlsx")
-        with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
-            # Checkout Summary
-            df.to_excel(writer, sheet_name='Checkouts', index=False)
-            
-            # Additional statistics
-            stats = pd.DataFrame([
-                {"Metric": "Total Checkouts", "Value": len(checkouts)},
-                {"Metric": "Books Returned", "Value": len([c for c in checkouts if c.is_returned])},
-                {"Metric": "Books Outstanding", "Value": len([c for c in checkouts if not c.is_returned])},
-                {"Metric": "Overdue Books", "Value": len([c for c in checkouts if not c.is_returned and c.due_date < current_time])}
-            ])
-            stats.to_excel(writer, sheet_name='Statistics', index=False)
+        report_path = write_report(
+            os.path.join(reports_dir, f"weekly_report_{current_time.strftime('%Y%m%d')}"),
+            output_format,
+            WEEKLY_REPORT_COLUMNS,
+            rows,
+            statistics
+        )
             
         print(f"Weekly report saved to {report_path}")
         return report_path
@@ -149,112 +210,79 @@ def generate_weekly_report():
 def send_due_soon_notices():
     """Send reminders for books due in the next 2 days."""
     print("Starting due soon notices task...")
-    db = get_db_session()
+    db = get_read_session()
     current_time = datetime.utcnow()
     due_soon = current_time + timedelta(days=2)
     
     try:
-        # Get checkouts due in the next 2 days
+        # One joined query for checkouts due in the next 2 days, streamed patron by patron
         print("Querying due soon checkouts...")
-        upcoming_due = (
-            db.query(Checkout)
-            .filter(
-                Checkout.due_date.between(current_time, due_soon),
-                Checkout.is_returned == False
-            )
-            .all()
+        rows = stream_notice_rows(
+            db,
+            Checkout.due_date.between(current_time, due_soon),
+            Checkout.is_returned == False
         )
-        print(f"Found {len(upcoming_due)} due soon checkouts")
         
-        # Group by patron
-        patron_checkouts = {}
-        for checkout in upcoming_due:
-            if checkout.patron_id not in patron_checkouts:
-                patron_checkouts[checkout.patron_id] = []
-            patron_checkouts[checkout.patron_id].append(checkout)
-        
-        # Send emails
-        for patron_id, checkouts in patron_checkouts.items():
-            print(f"Processing patron {patron_id}...")
-            patron = db.query(Patron).filter(Patron.id == patron_id).first()
-            if not patron:
-                print(f"Patron {patron_id} not found, skipping...")
-                continue
-            
-            due_books = []
-            for checkout in checkouts:
-                book = db.query(Book).filter(Book.id == checkout.book_id).first()
-                if book:
-                    due_books.append({
-                        "title": book.title,
-                        "author": book.author,
-                        "due_date": checkout.due_date
-                    })
-            
-            # Send reminder email
-            template_data = {
-                "patron_name": patron.name,
-                "due_books": due_books
+        def due_book(row):
+            return {
+                "title": row.title,
+                "author": row.author,
+                "due_date": row.due_date.isoformat()
             }
-            
-            print(f"Sending email to {patron.email}...")
-            asyncio.run(send_email(
-                to_email=patron.email,
-                subject="Books Due Soon Reminder",
-                template_name="due_soon_notice",
-                template_data=template_data
-            ))
-            print(f"Email sent to {patron.email}")
+        
+        patrons, chunks = 0, 0
+        for chunk in iter_notice_chunks(rows, due_book):
+            send_due_soon_notice_batch.delay(chunk)
+            patrons += len(chunk)
+            chunks += 1
+        print(f"Queued due soon notices for {patrons} patrons in {chunks} batches")
+        return patrons
     
     finally:
         db.close()
         print("Due soon notices task completed")
 
+@celery.task
+def send_due_soon_notice_batch(notices):
+    """Send due soon reminders for one chunk of patrons queued by send_due_soon_notices."""
+    messages = build_messages(
+        subject="Books Due Soon Reminder",
+        template_name="due_soon_notice",
+        payloads=[
+            {
+                "to_email": notice["email"],
+                "template_data": {
+                    "patron_name": notice["patron_name"],
+                    "due_books": with_due_dates(notice["books"])
+                }
+            }
+            for notice in notices
+        ]
+    )
+    
+    results = asyncio.run(send_many(messages))
+    return sum(results)
+
 @celery.task
 def generate_monthly_analytics():
     """Generate monthly analytics report with detailed statistics."""
     print("Starting monthly analytics task...")
-    db = get_db_session()
     current_time = datetime.utcnow()
     month_ago = current_time - timedelta(days=30)
     
+    # Rollups are written on the primary; the report itself reads from a
+    # replica, which covers days its copy has not rolled up yet live
+    primary = TaskSession()
     try:
-        # Gather monthly statistics
+        rollup_pending_days(primary)
+    finally:
+        primary.close()
+    
+    db = get_read_session()
+    try:
+        # Sum the daily rollups instead of rescanning 30 days of checkouts
         print("Querying monthly statistics...")
-        monthly_data = {
-            "total_checkouts": db.query(Checkout).filter(
-                Checkout.checkout_date >= month_ago
-            ).count(),
-            
-            "active_patrons": db.query(Checkout).filter(
-                Checkout.checkout_date >= month_ago
-            ).distinct(Checkout.patron_id).count(),
-            
-            "overdue_books": db.query(Checkout).filter(
-                Checkout.due_date < current_time,
-                Checkout.is_returned == False
-            ).count(),
-            
-            "most_popular_books": db.query(
-                Book.title,
-                Book.author,
-                func.count(Checkout.id).label('checkout_count')
-            ).join(Checkout).filter(
-                Checkout.checkout_date >= month_ago
-            ).group_by(Book.id).order_by(
-                func.count(Checkout.id).desc()
-            ).limit(10).all(),
-            
-            "average_checkout_duration": db.query(
-                func.avg(
-                    case(
-                        (Checkout.return_date != None,
-                         Checkout.return_date - Checkout.checkout_date),
-                        else_=current_time - Checkout.checkout_date
-                    )
-                )
-            ).filter(Checkout.checkout_date >= month_ago).scalar()
-        }
+        monthly_data = summarize(db, month_ago.date(), current_time.date())
         print("Monthly statistics gathered")
         
         # Create reports directory if it doesn't exist
@@ -263,28 +291,19 @@ def generate_monthly_analytics():
         
         # Generate Excel report
         report_path = os.path.join(reports_dir, f"monthly_analytics_{current_time.strftime('%Y%m')}.xlsx")
-        
-        with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
-            # Summary Statistics
-            summary_df = pd.DataFrame([{
-                "Metric": "Total Checkouts",
-                "Value": monthly_data["total_checkouts"]
-            }, {
-                "Metric": "Active Patrons",
-                "Value": monthly_data["active_patrons"]
-            }, {
-                "Metric": "Overdue Books",
-                "Value": monthly_data["overdue_books"]
-            }, {
-                "Metric": "Average Checkout Duration (days)",
-                "Value": monthly_data["average_checkout_duration"].days if monthly_data["average_checkout_duration"] else 0
-            }])
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Popular Books
-            popular_books_df = pd.DataFrame(monthly_data["most_popular_books"],
-                                          columns=['Title', 'Author', 'Checkouts'])
-            popular_books_df.to_excel(writer, sheet_name='Popular Books', index=False)
+        write_xlsx(report_path, {
+            "Summary": (("Metric", "Value"), [
+                ("Total Checkouts", monthly_data["total_checkouts"]),
+                ("Books Returned", monthly_data["total_returns"]),
+                ("Active Patrons", monthly_data["active_patrons"]),
+                ("Overdue Books", monthly_data["overdue_books"]),
+                ("Average Checkout Duration (days)", monthly_data["average_checkout_duration_days"])
+            ]),
+            "Popular Books": (("Title", "Author", "Checkouts"), [
+                (book["title"], book["author"], book["checkouts"])
+                for book in monthly_data["most_popular_books"]
+            ])
+        })
         
         print(f"Monthly analytics report saved to {report_path}")
         return report_path
@@ -292,3 +311,37 @@ def generate_monthly_analytics():
     finally:
         db.close()
         print("Monthly analytics task completed")
+
+@celery.task
+def rollup_daily_analytics():
+    """
+    Fill the daily analytics rollups for the closed days not rolled up yet,
+    at most ANALYTICS_ROLLUP_MAX_DAYS per run; the analytics queries cover
+    the rest live until it catches up.
+    """
+    print("Starting daily analytics rollup task...")
+    db = TaskSession()
+    
+    try:
+        days = rollup_pending_days(db)
+        print(f"Rolled up {days} days of checkout analytics")
+        return days
+    
+    finally:
+        db.close()
+        print("Daily analytics rollup task completed")
+
+@celery.task
+def reconcile_book_availability():
+    """Repair drift between the Redis availability cache and the books table."""
+    print("Starting availability reconciliation task...")
+    db = TaskSession()
+    
+    try:
+        stats = reconcile_availability(db)
+        print(f"Checked {stats['checked']} books, repaired {stats['repaired']}, removed {stats['removed']} stale entries")
+        return stats
+    
+    finally:
+        db.close()
+        print("Availability reconciliation task completed")
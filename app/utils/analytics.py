@@ -0,0 +1,220 @@
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import Date, cast, delete, func, insert, literal, select, union, union_all
+from sqlalchemy.orm import Session
+
+from app.models.models import Book, Checkout, DailyBookCheckouts, DailyCheckoutStats, DailyPatronActivity
+
+# Longest range the analytics API will summarize in one request
+MAX_ANALYTICS_DAYS = 3660
+TOP_BOOKS_LIMIT = 10
+# Most days one scheduled rollup run builds; a first deploy over a long
+# history catches up over several runs, or at once with the
+# rollup_analytics management command
+ANALYTICS_ROLLUP_MAX_DAYS = int(os.getenv("ANALYTICS_ROLLUP_MAX_DAYS", "31"))
+
+def day_bounds(start: date, end: date):
+    """Half-open datetime range covering the days `start` through `end`."""
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+def duration_seconds(dialect_name: str):
+    """SQL expression for the loan duration of a returned checkout, in seconds."""
+    if dialect_name == "postgresql":
+        return func.extract("epoch", Checkout.return_date - Checkout.checkout_date)
+    return (func.julianday(Checkout.return_date) - func.julianday(Checkout.checkout_date)) * 86400
+
+def day_of(column, dialect_name: str):
+    """SQL expression for the (UTC) day of a datetime column."""
+    if dialect_name == "postgresql":
+        return cast(column, Date)
+    return func.date(column, type_=Date)
+
+def rolled_up_through(db: Session) -> Optional[date]:
+    """Last day already rolled up, or None before the first run."""
+    return db.scalar(select(func.max(DailyCheckoutStats.day)))
+
+def rollup_day(db: Session, day: date):
+    """
+    (Re)build the rollup rows of one day from `checkouts`. Checkouts are
+    bucketed by checkout day and returns by return day, so a closed day's
+    rows never change afterwards. Does not commit.
+    """
+    day_start, day_end = day_bounds(day, day)
+    checked_out = (Checkout.checkout_date >= day_start, Checkout.checkout_date < day_end)
+    returned = (Checkout.return_date >= day_start, Checkout.return_date < day_end)
+    dialect_name = db.get_bind().dialect.name
+
+    for model in (DailyCheckoutStats, DailyBookCheckouts, DailyPatronActivity):
+        db.execute(delete(model).where(model.day == day))
+
+    db.execute(insert(DailyBookCheckouts).from_select(
+        ["day", "book_id", "checkouts"],
+        select(literal(day, Date), Checkout.book_id, func.count(Checkout.id))
+        .where(*checked_out, Checkout.book_id != None)
+        .group_by(Checkout.book_id)
+    ))
+    db.execute(insert(DailyPatronActivity).from_select(
+        ["day", "patron_id", "checkouts"],
+        select(literal(day, Date), Checkout.patron_id, func.count(Checkout.id))
+        .where(*checked_out, Checkout.patron_id != None)
+        .group_by(Checkout.patron_id)
+    ))
+
+    checkouts, active_patrons = db.execute(
+        select(func.count(Checkout.id), func.count(func.distinct(Checkout.patron_id)))
+        .where(*checked_out)
+    ).one()
+    returns, returned_duration = db.execute(
+        select(func.count(Checkout.id), func.coalesce(func.sum(duration_seconds(dialect_name)), 0))
+        .where(*returned)
+    ).one()
+    db.add(DailyCheckoutStats(
+        day=day,
+        checkouts=checkouts,
+        returns=returns,
+        returned_duration_seconds=int(returned_duration),
+        active_patrons=active_patrons
+    ))
+    db.flush()
+
+def rollup_pending_days(db: Session, until: Optional[date] = None,
+                        max_days: Optional[int] = ANALYTICS_ROLLUP_MAX_DAYS) -> int:
+    """
+    Roll up the closed days after the last rolled-up one, through `until`
+    (default: yesterday, UTC), oldest first and at most `max_days` of them
+    (None for no limit). Commits day by day, so an interrupted or capped run
+    resumes where it stopped. Returns the number of days rolled up.
+    """
+    until = until or datetime.utcnow().date() - timedelta(days=1)
+    last = rolled_up_through(db)
+    if last is None:
+        first_checkout = db.scalar(select(func.min(Checkout.checkout_date)))
+        if first_checkout is None:
+            return 0
+        day = first_checkout.date()
+    else:
+        day = last + timedelta(days=1)
+
+    days = 0
+    while day <= until and (max_days is None or days < max_days):
+        rollup_day(db, day)
+        db.commit()
+        day += timedelta(days=1)
+        days += 1
+    return days
+
+def live_start(db: Session, start: date) -> date:
+    """First day of a range that is not covered by the rollups yet."""
+    last = rolled_up_through(db)
+    return start if last is None else max(start, last + timedelta(days=1))
+
+def summarize(db: Session, start: date, end: date) -> Dict:
+    """
+    Checkout analytics for the days `start` through `end` (UTC, inclusive).
+    Rolled-up days are summed from the rollup tables; only the days not
+    rolled up yet, normally just today, are aggregated from `checkouts`.
+    The average duration covers checkouts returned within the range.
+    """
+    live_from = live_start(db, start)
+    rolled_until = live_from - timedelta(days=1)
+    live_range_start, live_range_end = day_bounds(live_from, end)
+    live_checkouts = (Checkout.checkout_date >= live_range_start, Checkout.checkout_date < live_range_end)
+    live_returns = (Checkout.return_date >= live_range_start, Checkout.return_date < live_range_end)
+    in_rollups = lambda model: (model.day >= start, model.day <= rolled_until)
+
+    checkouts, returns, returned_duration = db.execute(
+        select(
+            func.coalesce(func.sum(DailyCheckoutStats.checkouts), 0),
+            func.coalesce(func.sum(DailyCheckoutStats.returns), 0),
+            func.coalesce(func.sum(DailyCheckoutStats.returned_duration_seconds), 0)
+        ).where(*in_rollups(DailyCheckoutStats))
+    ).one()
+    if live_from <= end:
+        checkouts += db.scalar(select(func.count(Checkout.id)).where(*live_checkouts))
+        live_returned, live_duration = db.execute(
+            select(
+                func.count(Checkout.id),
+                func.coalesce(func.sum(duration_seconds(db.get_bind().dialect.name)), 0)
+            ).where(*live_returns)
+        ).one()
+        returns += live_returned
+        returned_duration += live_duration
+
+    # Distinct patrons across the range: patron-days from the rollups plus live checkouts
+    patrons = union(
+        select(DailyPatronActivity.patron_id).where(*in_rollups(DailyPatronActivity)),
+        select(Checkout.patron_id).where(*live_checkouts, Checkout.patron_id != None)
+    ).subquery()
+    active_patrons = db.scalar(select(func.count()).select_from(patrons))
+
+    book_counts = union_all(
+        select(DailyBookCheckouts.book_id, DailyBookCheckouts.checkouts.label("checkouts"))
+        .where(*in_rollups(DailyBookCheckouts)),
+        select(Checkout.book_id, func.count(Checkout.id).label("checkouts"))
+        .where(*live_checkouts, Checkout.book_id != None)
+        .group_by(Checkout.book_id)
+    ).subquery()
+    total = func.sum(book_counts.c.checkouts).label("checkouts")
+    top_books = db.execute(
+        select(Book.id, Book.title, Book.author, total)
+        .join(book_counts, book_counts.c.book_id == Book.id)
+        .group_by(Book.id, Book.title, Book.author)
+        .order_by(total.desc(), Book.id)
+        .limit(TOP_BOOKS_LIMIT)
+    ).all()
+
+    return {
+        "start": start,
+        "end": end,
+        "total_checkouts": checkouts,
+        "total_returns": returns,
+        "active_patrons": active_patrons,
+        "average_checkout_duration_days": round(float(returned_duration) / returns / 86400, 2) if returns else 0,
+        "overdue_books": db.scalar(select(func.count(Checkout.id)).where(
+            Checkout.due_date < datetime.utcnow(),
+            Checkout.is_returned == False
+        )),
+        "most_popular_books": [
+            {"book_id": book_id, "title": title, "author": author, "checkouts": count}
+            for book_id, title, author, count in top_books
+        ],
+    }
+
+def daily_series(db: Session, start: date, end: date) -> list:
+    """Per-day checkouts, returns and active patrons for `start` through `end`."""
+    rows = {
+        row.day: {"day": row.day, "checkouts": row.checkouts, "returns": row.returns,
+                  "active_patrons": row.active_patrons}
+        for row in db.scalars(
+            select(DailyCheckoutStats)
+            .where(DailyCheckoutStats.day >= start, DailyCheckoutStats.day <= end)
+        )
+    }
+    # Days not rolled up yet, however many, cost one grouped query for
+    # checkouts and one for returns
+    live_from = live_start(db, start)
+    if live_from <= end:
+        range_start, range_end = day_bounds(live_from, end)
+        dialect_name = db.get_bind().dialect.name
+        checkout_day = day_of(Checkout.checkout_date, dialect_name).label("day")
+        return_day = day_of(Checkout.return_date, dialect_name).label("day")
+        for day, checkouts, active_patrons in db.execute(
+            select(checkout_day, func.count(Checkout.id), func.count(func.distinct(Checkout.patron_id)))
+            .where(Checkout.checkout_date >= range_start, Checkout.checkout_date < range_end)
+            .group_by(checkout_day)
+        ):
+            rows[day] = {"day": day, "checkouts": checkouts, "returns": 0, "active_patrons": active_patrons}
+        for day, returns in db.execute(
+            select(return_day, func.count(Checkout.id))
+            .where(Checkout.return_date >= range_start, Checkout.return_date < range_end)
+            .group_by(return_day)
+        ):
+            rows.setdefault(day, {"day": day, "checkouts": 0, "returns": 0, "active_patrons": 0})["returns"] = returns
+
+    series, day = [], start
+    while day <= end:
+        series.append(rows.get(day, {"day": day, "checkouts": 0, "returns": 0, "active_patrons": 0}))
+        day += timedelta(days=1)
+    return series
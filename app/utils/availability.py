@@ -0,0 +1,163 @@
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.models import models
+from app.utils.redis_client import get_async_redis, get_redis
+
+# Write-through copy of books.available_quantity in one Redis hash
+# (field = book id), so availability polls never reach Postgres
+AVAILABILITY_ENABLED = os.getenv("AVAILABILITY_CACHE_ENABLED", "true").lower() == "true"
+AVAILABILITY_KEY = "books:available"
+# Books written to / checked against Redis per round trip during reconciliation
+RECONCILE_BATCH_SIZE = 1000
+# Every change to the hash is also published here, as "id:available,..." pairs
+# (an empty value means the book was deleted), for the live availability feed
+AVAILABILITY_CHANNEL = "books:available:changes"
+
+# Checkouts and returns apply a delta, which commutes under concurrency, so
+# their write-throughs can land in any order. The absolute value from the
+# database seeds the field when it is missing.
+APPLY_DELTA_SCRIPT = """
+local value
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    value = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+    value = tonumber(ARGV[3])
+end
+redis.call('PUBLISH', ARGV[4], ARGV[1] .. ':' .. value)
+return value
+"""
+
+def encode_changes(changes: Dict[int, Optional[int]]) -> str:
+    return ",".join(f"{book_id}:{'' if value is None else value}" for book_id, value in changes.items())
+
+def decode_changes(payload: str) -> Dict[int, Optional[int]]:
+    changes = {}
+    for pair in payload.split(","):
+        book_id, _, value = pair.partition(":")
+        changes[int(book_id)] = int(value) if value else None
+    return changes
+
+async def set_availability(availability: Dict[int, int]):
+    """Store absolute availability for books that were created, edited or loaded from the database."""
+    if not AVAILABILITY_ENABLED or not availability:
+        return
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            pipe.hset(AVAILABILITY_KEY, mapping=availability)
+            pipe.publish(AVAILABILITY_CHANNEL, encode_changes(availability))
+            await pipe.execute()
+    except RedisError as e:
+        print(f"Failed to update availability cache: {str(e)}")
+
+async def apply_availability_delta(book_id: int, delta: int, available_quantity: int):
+    """Record one checkout (-1) or return (+1); `available_quantity` is the value the database returned."""
+    if not AVAILABILITY_ENABLED or available_quantity is None:
+        return
+    try:
+        await get_async_redis().eval(
+            APPLY_DELTA_SCRIPT, 1, AVAILABILITY_KEY, book_id, delta, available_quantity, AVAILABILITY_CHANNEL
+        )
+    except RedisError as e:
+        print(f"Failed to update availability cache: {str(e)}")
+
+async def apply_availability_deltas(changes: Dict[int, Tuple[int, int]]):
+    """
+    Record a batch checkout or return in one round trip: `changes` maps book
+    id to (delta, available quantity the database returned).
+    """
+    if not AVAILABILITY_ENABLED or not changes:
+        return
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for book_id, (delta, available_quantity) in changes.items():
+                pipe.eval(
+                    APPLY_DELTA_SCRIPT, 1, AVAILABILITY_KEY, book_id, delta, available_quantity, AVAILABILITY_CHANNEL
+                )
+            await pipe.execute()
+    except RedisError as e:
+        print(f"Failed to update availability cache: {str(e)}")
+
+async def remove_availability(*book_ids: int):
+    if not AVAILABILITY_ENABLED or not book_ids:
+        return
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            pipe.hdel(AVAILABILITY_KEY, *book_ids)
+            pipe.publish(AVAILABILITY_CHANNEL, encode_changes(dict.fromkeys(book_ids)))
+            await pipe.execute()
+    except RedisError as e:
+        print(f"Failed to update availability cache: {str(e)}")
+
+async def get_availability(book_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """
+    Read availability for many books in one HMGET. Books missing from the
+    cache (or every book, if Redis is unreachable) map to None.
+    """
+    book_ids = list(book_ids)
+    if not AVAILABILITY_ENABLED or not book_ids:
+        return dict.fromkeys(book_ids)
+    try:
+        values = await get_async_redis().hmget(AVAILABILITY_KEY, book_ids)
+    except RedisError as e:
+        print(f"Failed to read availability cache: {str(e)}")
+        return dict.fromkeys(book_ids)
+    return {
+        book_id: None if value is None else int(value)
+        for book_id, value in zip(book_ids, values)
+    }
+
+def reconcile_availability(db, batch_size: int = RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Repair drift between the cache and the books table: rewrite every field
+    whose value differs from the database and drop fields of deleted books.
+    Runs with sync clients, for Celery.
+    """
+    redis = get_redis()
+    stats = {"checked": 0, "repaired": 0, "removed": 0}
+
+    def repair(batch: Dict[int, int]):
+        cached = redis.hmget(AVAILABILITY_KEY, list(batch))
+        drifted = {
+            book_id: available
+            for (book_id, available), value in zip(batch.items(), cached)
+            if value is None or int(value) != available
+        }
+        if drifted:
+            redis.hset(AVAILABILITY_KEY, mapping=drifted)
+            redis.publish(AVAILABILITY_CHANNEL, encode_changes(drifted))
+        stats["checked"] += len(batch)
+        stats["repaired"] += len(drifted)
+
+    rows = db.execute(
+        select(models.Book.id, models.Book.available_quantity)
+        .execution_options(yield_per=batch_size)
+    )
+    batch = {}
+    for book_id, available in rows:
+        batch[book_id] = available or 0
+        if len(batch) >= batch_size:
+            repair(batch)
+            batch = {}
+    if batch:
+        repair(batch)
+
+    # Drop cached books that no longer exist
+    cursor = 0
+    while True:
+        cursor, fields = redis.hscan(AVAILABILITY_KEY, cursor, count=batch_size)
+        if fields:
+            ids = [int(field) for field in fields]
+            existing = set(db.scalars(select(models.Book.id).where(models.Book.id.in_(ids))))
+            stale = [book_id for book_id in ids if book_id not in existing]
+            if stale:
+                redis.hdel(AVAILABILITY_KEY, *stale)
+                redis.publish(AVAILABILITY_CHANNEL, encode_changes(dict.fromkeys(stale)))
+                stats["removed"] += len(stale)
+        if cursor == 0:
+            break
+    return stats
@@ -0,0 +1,119 @@
+import asyncio
+import os
+from typing import Dict, Iterable, Optional, Set
+
+from redis.exceptions import RedisError
+
+from app.utils.availability import AVAILABILITY_CHANNEL, decode_changes, get_availability
+from app.utils.redis_client import get_async_redis
+
+# Most books one feed connection may follow
+AVAILABILITY_FEED_MAX_BOOKS = int(os.getenv("AVAILABILITY_FEED_MAX_BOOKS", "1000"))
+# Seconds to wait before resubscribing after the Redis connection drops
+AVAILABILITY_FEED_RECONNECT_DELAY = 1.0
+
+class Subscriber:
+    """
+    One feed connection: the books it follows and the changes not sent yet.
+    Changes coalesce per book until the connection takes them, so a slow
+    client holds at most one value per book, never a growing queue.
+    """
+
+    __slots__ = ("book_ids", "pending", "ready")
+
+    def __init__(self):
+        self.book_ids: Set[int] = set()
+        self.pending: Dict[int, Optional[int]] = {}
+        self.ready = asyncio.Event()
+
+    def push(self, changes: Dict[int, Optional[int]]):
+        self.pending.update(changes)
+        self.ready.set()
+
+    async def next_changes(self, timeout: Optional[float] = None) -> Dict[int, Optional[int]]:
+        """Wait for changes and take them all; empty if `timeout` passes first."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self.ready.clear()
+        changes, self.pending = self.pending, {}
+        return changes
+
+class AvailabilityHub:
+    """
+    Per-process fan-out of availability changes. The process holds a single
+    Redis pub/sub subscription whatever the number of clients, and routes
+    each published change to the subscribers following that book through an
+    in-memory index, so idle connections cost no Redis or database work.
+    """
+
+    def __init__(self):
+        self._by_book: Dict[int, Set[Subscriber]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def subscribe(self, subscriber: Subscriber, book_ids: Iterable[int]):
+        """Follow more books; their current availability is pushed straight away."""
+        new = set(book_ids) - subscriber.book_ids
+        if len(subscriber.book_ids) + len(new) > AVAILABILITY_FEED_MAX_BOOKS:
+            raise ValueError(f"A feed can follow at most {AVAILABILITY_FEED_MAX_BOOKS} books")
+        for book_id in new:
+            self._by_book.setdefault(book_id, set()).add(subscriber)
+        subscriber.book_ids |= new
+        self._ensure_listening()
+
+        # Books not cached yet are left out until their first change
+        snapshot = await get_availability(new)
+        subscriber.push({book_id: value for book_id, value in snapshot.items() if value is not None})
+
+    def unsubscribe(self, subscriber: Subscriber, book_ids: Optional[Iterable[int]] = None):
+        """Stop following `book_ids`, or every book when None (on disconnect)."""
+        removed = subscriber.book_ids if book_ids is None else subscriber.book_ids & set(book_ids)
+        for book_id in removed:
+            followers = self._by_book.get(book_id)
+            if followers is not None:
+                followers.discard(subscriber)
+                if not followers:
+                    del self._by_book[book_id]
+        subscriber.book_ids = subscriber.book_ids - removed
+        for book_id in removed:
+            subscriber.pending.pop(book_id, None)
+
+    def dispatch(self, changes: Dict[int, Optional[int]]):
+        for book_id, value in changes.items():
+            for subscriber in self._by_book.get(book_id, ()):
+                subscriber.push({book_id: value})
+
+    def _ensure_listening(self):
+        # A new event loop (tests, reloads) needs its own listener
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._listener.get_loop() is not loop:
+            self._listener = loop.create_task(self._listen())
+
+    async def _resync(self):
+        """Push current values for every followed book, covering changes missed while disconnected."""
+        book_ids = list(self._by_book)
+        for start in range(0, len(book_ids), AVAILABILITY_FEED_MAX_BOOKS):
+            snapshot = await get_availability(book_ids[start:start + AVAILABILITY_FEED_MAX_BOOKS])
+            self.dispatch({book_id: value for book_id, value in snapshot.items() if value is not None})
+
+    async def _listen(self):
+        reconnecting = False
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(AVAILABILITY_CHANNEL)
+                if reconnecting:
+                    await self._resync()
+                    print("Availability feed resubscribed")
+                reconnecting = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(decode_changes(message["data"]))
+            except (RedisError, OSError) as e:
+                print(f"Availability feed lost its Redis subscription: {str(e)}")
+                await asyncio.sleep(AVAILABILITY_FEED_RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+availability_hub = AvailabilityHub()
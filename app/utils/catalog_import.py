@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models import models
+from app.schemas import schemas
+
+# Rows written per batch (and per transaction)
+BATCH_SIZE = 5000
+# Per-row errors kept in the report; the failed count keeps counting past this
+MAX_REPORTED_ERRORS = 1000
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+COLUMNS = ("title", "author", "isbn", "quantity")
+
+def detect_format(filename: str = None, content_type: str = None) -> str:
+    """Guess the import format from an upload's filename or content type."""
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+def is_valid_utf8(text: str) -> bool:
+    """False when `text` holds bytes that did not decode (kept as surrogates)."""
+    try:
+        text.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    Yield `(row number, record)` pairs from a binary stream one row at a
+    time, so the input is never loaded into memory as a whole. Rows that
+    cannot be parsed are yielded as ValueErrors describing the problem, so
+    the caller can report them and carry on.
+    """
+    # A leading byte-order mark (Excel's "CSV UTF-8") is dropped, and bytes
+    # that are not UTF-8 fail their own row instead of the whole import
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="surrogateescape", newline="")
+    if fmt == "csv":
+        # Row 1 is the header
+        for row_number, record in enumerate(csv.DictReader(text), start=2):
+            if not all(is_valid_utf8(value) for value in record.values() if isinstance(value, str)):
+                yield row_number, ValueError("Invalid UTF-8 text")
+                continue
+            yield row_number, record
+    elif fmt == "ndjson":
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            if not is_valid_utf8(line):
+                yield row_number, ValueError("Invalid UTF-8 text")
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}', expected one of: {', '.join(SUPPORTED_FORMATS)}")
+
+def _copy_upsert(engine, rows: List[Dict]):
+    """Postgres: COPY the batch into a temp table, then upsert it in one statement."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in COLUMNS])
+    buffer.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE books_import "
+                "(title text, author text, isbn text, quantity integer) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                "COPY books_import (title, author, isbn, quantity) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            cursor.execute(
+                "INSERT INTO books (title, author, isbn, quantity, available_quantity, updated_at) "
+                "SELECT title, author, isbn, quantity, quantity, timezone('utc', now()) FROM books_import "
+                "ON CONFLICT (isbn) DO UPDATE SET "
+                "title = EXCLUDED.title, "
+                "author = EXCLUDED.author, "
+                "quantity = EXCLUDED.quantity, "
+                "updated_at = EXCLUDED.updated_at, "
+                "available_quantity = GREATEST("
+                "books.available_quantity + EXCLUDED.quantity - books.quantity, 0)"
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _sqlite_upsert(engine, rows: List[Dict]):
+    """SQLite: one executemany INSERT ... ON CONFLICT for the batch."""
+    stmt = sqlite_insert(models.Book)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Book.isbn],
+        set_={
+            "title": stmt.excluded.title,
+            "author": stmt.excluded.author,
+            "quantity": stmt.excluded.quantity,
+            "updated_at": stmt.excluded.updated_at,
+            "available_quantity": func.max(
+                models.Book.available_quantity + stmt.excluded.quantity - models.Book.quantity, 0
+            ),
+        }
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt, [dict(row, available_quantity=row["quantity"]) for row in rows])
+
+# Batch upsert per engine dialect name
+UPSERTS = {
+    "postgresql": _copy_upsert,
+    "sqlite": _sqlite_upsert,
+}
+
+def import_books(engine, stream: BinaryIO, fmt: str = "csv", batch_size: int = BATCH_SIZE) -> Dict:
+    """
+    Stream books from a CSV (with a title,author,isbn,quantity header) or
+    NDJSON file into the catalog, upserting on isbn.
+
+    Rows are validated against schemas.BookCreate and written in batches,
+    each in its own transaction. An existing isbn gets the new title,
+    author and quantity, and its available copies shift by the change in
+    quantity. Invalid rows are skipped and reported with their row number.
+    """
+    upsert = UPSERTS.get(engine.dialect.name)
+    if upsert is None:
+        raise ValueError(
+            f"Catalog import does not support the '{engine.dialect.name}' database, "
+            f"expected one of: {', '.join(UPSERTS)}"
+        )
+    report = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(row_number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+
+    # Keyed by isbn: a repeated isbn within a batch keeps its last occurrence,
+    # since one upsert statement cannot touch the same row twice
+    batch: Dict[str, Dict] = {}
+    for row_number, record in iter_records(stream, fmt):
+        if isinstance(record, Exception):
+            fail(row_number, str(record))
+            continue
+        try:
+            book = schemas.BookCreate.model_validate(record)
+        except ValidationError as e:
+            fail(row_number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ))
+            continue
+
+        batch[book.isbn] = book.model_dump(include=set(COLUMNS))
+        report["imported"] += 1
+        if len(batch) >= batch_size:
+            upsert(engine, list(batch.values()))
+            batch = {}
+
+    if batch:
+        upsert(engine, list(batch.values()))
+    return report
@@ -0,0 +1,62 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models import models
+from app.utils.pagination import keyset_query, split_page
+
+# Nested checkouts returned with a book or patron, per page
+CHECKOUTS_PAGE_SIZE = 50
+MAX_CHECKOUTS_PAGE_SIZE = 500
+CHECKOUT_STATUS_FILTERS = {
+    "all": None,
+    "active": models.Checkout.is_returned == False,
+    "returned": models.Checkout.is_returned == True,
+}
+
+async def load_checkouts_page(
+    db: AsyncSession,
+    owner,
+    owner_column,
+    status: str = "all",
+    cursor: Optional[str] = None,
+    limit: int = CHECKOUTS_PAGE_SIZE,
+) -> Optional[str]:
+    """
+    Load one keyset page of `owner.checkouts`, newest first, in a single
+    query and attach it as the relationship's loaded value, so serialization
+    never triggers a load of the full history. Current loans come on the
+    first page however long the history is. `owner_column` is the checkout foreign key
+    pointing at `owner`. Returns the cursor of the next page, if any.
+    """
+    if status not in CHECKOUT_STATUS_FILTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid checkouts_status '{status}', expected one of: {', '.join(CHECKOUT_STATUS_FILTERS)}"
+        )
+    limit = max(1, min(limit, MAX_CHECKOUTS_PAGE_SIZE))
+
+    stmt = select(models.Checkout).where(owner_column == owner.id)
+    if CHECKOUT_STATUS_FILTERS[status] is not None:
+        stmt = stmt.where(CHECKOUT_STATUS_FILTERS[status])
+    rows = (await db.scalars(keyset_query(stmt, models.Checkout, cursor, limit, descending=True))).all()
+    checkouts, next_cursor = split_page(rows, models.Checkout, limit)
+    set_committed_value(owner, "checkouts", checkouts)
+    return next_cursor
+
+async def touch_patron(db: AsyncSession, patron_id: int):
+    """
+    Bump a patron's updated_at in the transaction that checks out or returns
+    their books, so it versions their checkout history the way a book's
+    updated_at does, without counting the history on every read.
+    """
+    await db.execute(
+        update(models.Patron)
+        .where(models.Patron.id == patron_id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
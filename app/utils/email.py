@@ -1,6 +1,10 @@
+import asyncio
 import os
-from typing import List, Dict
-from jinja2 import Environment, FileSystemLoader
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+from typing import List, Dict, Optional, Tuple
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, TemplateNotFound
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -10,26 +14,149 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))  # Using SSL port
 SMTP_USERNAME = os.getenv("SMTP_USERNAME", "your-email@gmail.com")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "your-app-password")
 SMTP_FROM = os.getenv("SMTP_FROM", "library@example.com")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+# Connections kept open (and messages in flight) per send_many call
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Reconnect attempts per message after a dropped connection
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "2"))
+
+# Compiled templates are cached on disk here, shared by every worker process
+# (the default is a per-user directory under the system temp dir)
+EMAIL_TEMPLATE_CACHE_DIR = os.getenv("EMAIL_TEMPLATE_CACHE_DIR") or None
+# Re-check template files for changes on every lookup; only useful while editing them
+EMAIL_TEMPLATE_AUTO_RELOAD = os.getenv("EMAIL_TEMPLATE_AUTO_RELOAD", "false").lower() == "true"
+# Processes build_messages renders in. Leave at 0 under the Celery prefork
+# pool, whose daemonic workers cannot start child processes.
+EMAIL_RENDER_PROCESSES = int(os.getenv("EMAIL_RENDER_PROCESSES", "0"))
 
 template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
-env = Environment(loader=FileSystemLoader(template_dir))
+env = Environment(
+    loader=FileSystemLoader(template_dir),
+    bytecode_cache=FileSystemBytecodeCache(EMAIL_TEMPLATE_CACHE_DIR),
+    auto_reload=EMAIL_TEMPLATE_AUTO_RELOAD,
+)
+# Plain-text templates drop the lines their block tags stand on
+text_env = env.overlay(trim_blocks=True, lstrip_blocks=True)
+
+class _TextExtractor(HTMLParser):
+    """Strip the markup from an HTML template, keeping its text and Jinja tags."""
+
+    SKIP_TAGS = {"head", "style", "script", "title"}
+    BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "li", "tr", "table", "ul", "ol"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skipping -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        # Source line breaks are just whitespace in HTML; <br> and blocks make the lines
+        if not self.skipping:
+            self.parts.append(data.replace("\n", " "))
+
+def html_to_text_template(source: str) -> str:
+    """Turn the source of an HTML email template into a plain-text template."""
+    extractor = _TextExtractor()
+    extractor.feed(source)
+    extractor.close()
+    lines = [" ".join(line.split()) for line in "".join(extractor.parts).splitlines()]
+    text, blank = [], False
+    for line in lines:
+        if line or not blank:
+            text.append(line)
+        blank = not line
+    return "\n".join(text).strip() + "\n"
+
+def load_text_template(template_name: str) -> Template:
+    # A hand-written email/<name>.txt wins over the derived one
+    try:
+        return text_env.get_template(f"email/{template_name}.txt")
+    except TemplateNotFound:
+        source, _, _ = env.loader.get_source(env, f"email/{template_name}.html")
+        return text_env.from_string(html_to_text_template(source))
+
+# template name -> (HTML template, plain-text template derived from it)
+_templates: Dict[str, Tuple[Template, Template]] = {}
+
+def get_templates(template_name: str) -> Tuple[Template, Template]:
+    """
+    The compiled HTML template and its plain-text alternative. The text
+    version is derived once per template (and again only when auto-reload
+    picks up a changed HTML file), not once per message.
+    """
+    html_template = env.get_template(f"email/{template_name}.html")
+    cached = _templates.get(template_name)
+    if cached is None or cached[0] is not html_template:
+        cached = (html_template, load_text_template(template_name))
+        _templates[template_name] = cached
+    return cached
+
+def build_message(to_email: str, subject: str, template_name: str, template_data: Dict) -> MIMEMultipart:
+    html_template, text_template = get_templates(template_name)
 
-async def send_email(to_email: str, subject: str, template_name: str, template_data: Dict):
-    template = env.get_template(f"email/{template_name}.html")
-    html_content = template.render(**template_data)
-    
     message = MIMEMultipart("alternative")
     message["From"] = SMTP_FROM
     message["To"] = to_email
     message["Subject"] = subject
-    
-    html_part = MIMEText(html_content, "html")
-    message.attach(html_part)
-    
-    try:
-        smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, use_tls=True)
-        await smtp.connect()
+
+    # Clients show the last alternative they support, so HTML goes last
+    message.attach(MIMEText(text_template.render(**template_data), "plain"))
+    message.attach(MIMEText(html_template.render(**template_data), "html"))
+    return message
+
+def _build_chunk(subject: str, template_name: str, payloads: List[Dict]) -> List[MIMEMultipart]:
+    return [
+        build_message(payload["to_email"], subject, template_name, payload["template_data"])
+        for payload in payloads
+    ]
+
+def build_messages(
+    subject: str,
+    template_name: str,
+    payloads: List[Dict],
+    processes: int = EMAIL_RENDER_PROCESSES,
+) -> List[MIMEMultipart]:
+    """
+    Render one template for a batch of recipients, each payload being
+    {"to_email": ..., "template_data": {...}}. Returns the messages in
+    payload order, ready for send_many. With `processes` > 1 the batch is
+    split across a process pool, which pays off for thousands of messages.
+    """
+    if processes <= 1 or len(payloads) < processes * 2:
+        return _build_chunk(subject, template_name, payloads)
+
+    chunk_size = -(-len(payloads) // (processes * 4))
+    chunks = [payloads[i:i + chunk_size] for i in range(0, len(payloads), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        rendered = executor.map(partial(_build_chunk, subject, template_name), chunks)
+        return [message for chunk in rendered for message in chunk]
+
+async def connect_smtp() -> aiosmtplib.SMTP:
+    smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, use_tls=SMTP_USE_TLS)
+    await smtp.connect()
+    if SMTP_USERNAME:
         await smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return smtp
+
+async def send_email(to_email: str, subject: str, template_name: str, template_data: Dict):
+    message = build_message(to_email, subject, template_name, template_data)
+
+    try:
+        smtp = await connect_smtp()
         await smtp.send_message(message)
         await smtp.quit()
         print(f"Successfully sent email to {to_email}")
@@ -37,3 +164,79 @@ async def send_email(to_email: str, subject: str, template_name: str, template_d
     except Exception as e:
         print(f"Failed to send email: {str(e)}")
         return False
+
+class SMTPConnectionPool:
+    """
+    Reusable, authenticated SMTP connections shared by concurrent sends.
+
+    At most `size` messages are in flight at once, each on its own
+    connection; connections go back to the pool after a send instead of
+    being closed, so a batch pays for the TLS handshake and login once per
+    connection rather than once per message. A connection that drops is
+    discarded and the message is retried on a fresh one. Must be used
+    within a single event loop.
+    """
+
+    def __init__(self, size: int = SMTP_POOL_SIZE, max_retries: int = SMTP_MAX_RETRIES):
+        self.size = size
+        self.max_retries = max_retries
+        self.connects = 0
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp = self._idle.pop()
+            if smtp.is_connected:
+                return smtp
+        self.connects += 1
+        return await connect_smtp()
+
+    @staticmethod
+    def _discard(smtp: Optional[aiosmtplib.SMTP]):
+        if smtp is not None:
+            smtp.close()
+
+    async def send(self, message: MIMEMultipart) -> bool:
+        async with self._slots:
+            for attempt in range(self.max_retries + 1):
+                smtp = None
+                try:
+                    smtp = await self._acquire()
+                    await smtp.send_message(message)
+                    self._idle.append(smtp)
+                    return True
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError,
+                        aiosmtplib.SMTPTimeoutError, ConnectionError) as e:
+                    # Connection-level failure: drop it and retry on a new one
+                    self._discard(smtp)
+                    print(f"SMTP connection failed sending to {message['To']} "
+                          f"(attempt {attempt + 1}): {str(e)}")
+                except aiosmtplib.SMTPException as e:
+                    # The server rejected this message; the connection is still usable
+                    if smtp is not None and smtp.is_connected:
+                        self._idle.append(smtp)
+                    print(f"Failed to send email to {message['To']}: {str(e)}")
+                    return False
+            return False
+
+    async def close(self):
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+async def send_many(messages: List[MIMEMultipart], pool_size: int = SMTP_POOL_SIZE) -> List[bool]:
+    """
+    Send a batch of messages over a pool of at most `pool_size` connections.
+    Returns whether each message was accepted, in the same order.
+    """
+    pool = SMTPConnectionPool(size=pool_size)
+    try:
+        results = await asyncio.gather(*(pool.send(message) for message in messages))
+    finally:
+        await pool.close()
+    print(f"Sent {sum(results)}/{len(messages)} emails over {pool.connects} connections")
+    return list(results)
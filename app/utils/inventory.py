@@ -0,0 +1,70 @@
+from typing import Dict, Optional
+
+from sqlalchemy import case, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+
+# Inventory changes are single conditional UPDATE ... RETURNING statements.
+# The database takes the row lock and re-checks the condition, so concurrent
+# checkouts of the same title can never oversell or lose an update.
+
+async def take_copy(db: AsyncSession, book_id: int) -> Optional[int]:
+    """
+    Take one copy of a book off the shelf. Returns the remaining available
+    quantity, or None when the book does not exist or has no copies left.
+    """
+    return await db.scalar(
+        update(models.Book)
+        .where(models.Book.id == book_id, models.Book.available_quantity > 0)
+        .values(available_quantity=models.Book.available_quantity - 1)
+        .returning(models.Book.available_quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+async def put_back_copy(db: AsyncSession, book_id: int) -> Optional[int]:
+    """Put one copy of a book back on the shelf and return the new available quantity."""
+    return await db.scalar(
+        update(models.Book)
+        .where(models.Book.id == book_id)
+        .values(available_quantity=models.Book.available_quantity + 1)
+        .returning(models.Book.available_quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+# The batch variants update every book of a multi-item checkout or return in
+# one statement. Postgres visits `id IN (...)` rows in index order, so two
+# overlapping batches lock their books in the same order and cannot deadlock.
+
+async def take_copies(db: AsyncSession, counts: Dict[int, int]) -> Dict[int, int]:
+    """
+    Take copies of several books off the shelf at once; `counts` maps book id
+    to the number of copies wanted. A book is only updated when all of its
+    copies can be taken. Returns the remaining available quantity of each
+    updated book; books left out do not exist or are short of copies.
+    """
+    if not counts:
+        return {}
+    wanted = case(counts, value=models.Book.id)
+    rows = await db.execute(
+        update(models.Book)
+        .where(models.Book.id.in_(counts), models.Book.available_quantity >= wanted)
+        .values(available_quantity=models.Book.available_quantity - wanted)
+        .returning(models.Book.id, models.Book.available_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(rows.all())
+
+async def put_back_copies(db: AsyncSession, counts: Dict[int, int]) -> Dict[int, int]:
+    """Put copies of several books back on the shelf and return their new available quantities."""
+    if not counts:
+        return {}
+    returned = case(counts, value=models.Book.id)
+    rows = await db.execute(
+        update(models.Book)
+        .where(models.Book.id.in_(counts))
+        .values(available_quantity=models.Book.available_quantity + returned)
+        .returning(models.Book.id, models.Book.available_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(rows.all())
@@ -0,0 +1,245 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from starlette.routing import Match
+
+# With several uvicorn or Celery worker processes, point this at an empty
+# directory shared by all of them (and wiped on deploy); each process then
+# writes its samples there and /metrics aggregates them.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled", ["method", "route"],
+    multiprocess_mode="livesum"
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ["route"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per HTTP request", ["route"]
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool", ["engine"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections handed out by the pool", ["engine"]
+)
+DB_POOL_CONNECTS = Counter(
+    "db_pool_connects_total", "New database connections opened by the pool", ["engine"]
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Last measured replication lag per read replica (-1: unreachable)",
+    ["replica"], multiprocess_mode="max"
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only sessions by the database they were routed to", ["target"]
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed", ["engine"])
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement latency", ["engine"])
+
+HTTP_REQUESTS_RATE_LIMITED = Counter(
+    "http_requests_rate_limited_total", "Requests refused with 429 by the rate limiter", ["limit"]
+)
+HTTP_REQUESTS_SHED = Counter(
+    "http_requests_shed_total", "Requests refused with 503 while the server was overloaded", ["reason"]
+)
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds", "Smoothed event loop scheduling delay", multiprocess_mode="max"
+)
+DB_POOL_WAIT = Gauge(
+    "db_pool_wait_seconds", "Smoothed wait for a connection from the API's pool", multiprocess_mode="max"
+)
+
+AVAILABILITY_FEED_SUBSCRIBERS = Gauge(
+    "availability_feed_subscribers", "Open availability feed connections", ["transport"],
+    multiprocess_mode="livesum"
+)
+AVAILABILITY_FEED_UPDATES = Counter(
+    "availability_feed_updates_total", "Availability update messages sent to feed connections", ["transport"]
+)
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task run time", ["task", "state"],
+    buckets=(0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+)
+CELERY_TASK_RETRIES = Counter("celery_task_retries_total", "Celery task retries", ["task"])
+CELERY_TASK_FAILURES = Counter(
+    "celery_task_failures_total", "Celery task failures", ["task", "exception"]
+)
+
+# [statement count, seconds] of the request being handled, if any
+request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+def instrument_engine(engine, name: str):
+    """
+    Record pool usage and statement counts/latency for a sync Engine (for an
+    AsyncEngine pass its `sync_engine`). Statements also count towards the
+    current request, when there is one.
+    """
+    labels = {"engine": name}
+
+    @event.listens_for(engine.pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTS.labels(**labels).inc()
+
+    @event.listens_for(engine.pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.labels(**labels).inc()
+        DB_POOL_CHECKED_OUT.labels(**labels).inc()
+
+    @event.listens_for(engine.pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(**labels).dec()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.labels(**labels).inc()
+        DB_QUERY_DURATION.labels(**labels).observe(elapsed)
+        counters = request_queries.get()
+        if counters is not None:
+            counters[0] += 1
+            counters[1] += elapsed
+
+def match_route(app, scope):
+    """The route a request will hit, or None."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+def route_template(app, scope) -> str:
+    """The path template of the route a request will hit, keeping label cardinality bounded."""
+    route = match_route(app, scope)
+    if route is None:
+        return "<unmatched>"
+    return getattr(route, "path", scope["path"])
+
+class PrometheusMiddleware:
+    """ASGI middleware recording latency, in-flight requests and SQL usage per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        counters = [0, 0.0]
+        token = request_queries.set(counters)
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method, route=route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method=method, route=route, status=status["code"]).inc()
+            HTTP_REQUEST_DB_QUERIES.labels(route=route).observe(counters[0])
+            HTTP_REQUEST_DB_SECONDS.labels(route=route).observe(counters[1])
+            in_progress.dec()
+            request_queries.reset(token)
+
+def render_metrics() -> bytes:
+    """Exposition of this process's metrics, or of every process in multiprocess mode."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop the live gauges of an exited process from the multiprocess directory."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+def instrument_celery(port: Optional[int] = None):
+    """
+    Record duration, retries and failures of every Celery task. With `port`,
+    the worker's main process also serves /metrics for all its pool
+    processes (multiprocess mode) on that port.
+    """
+    from celery.signals import (
+        task_failure,
+        task_postrun,
+        task_prerun,
+        task_retry,
+        worker_process_shutdown,
+        worker_ready,
+    )
+
+    started: Dict[str, float] = {}
+
+    @task_prerun.connect(weak=False)
+    def on_task_prerun(task_id=None, task=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    @task_postrun.connect(weak=False)
+    def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+        began = started.pop(task_id, None)
+        if began is not None:
+            CELERY_TASK_DURATION.labels(task=task.name, state=state or "UNKNOWN").observe(
+                time.perf_counter() - began
+            )
+
+    @task_retry.connect(weak=False)
+    def on_task_retry(sender=None, **kwargs):
+        CELERY_TASK_RETRIES.labels(task=sender.name).inc()
+
+    @task_failure.connect(weak=False)
+    def on_task_failure(sender=None, exception=None, **kwargs):
+        CELERY_TASK_FAILURES.labels(task=sender.name, exception=type(exception).__name__).inc()
+
+    @worker_process_shutdown.connect(weak=False)
+    def on_worker_process_shutdown(pid=None, **kwargs):
+        mark_process_dead(pid)
+
+    if port:
+        @worker_ready.connect(weak=False)
+        def on_worker_ready(**kwargs):
+            from prometheus_client import start_http_server
+
+            if PROMETHEUS_MULTIPROC_DIR:
+                registry = CollectorRegistry()
+                multiprocess.MultiProcessCollector(registry)
+                start_http_server(port, registry=registry)
+            else:
+                start_http_server(port)
@@ -0,0 +1,101 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Upper bound for a single page, regardless of what the client asks for
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor."""
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by encode_cursor, rejecting malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("unexpected cursor shape")
+        return [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def resolve_sort(model, sort: str, sort_columns: Dict[str, Optional[str]]):
+    """
+    Map a public sort name to the model column used as the leading keyset key.
+    Names mapped to None sort by primary key alone.
+    """
+    if sort not in sort_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort '{sort}', expected one of: {', '.join(sort_columns)}"
+        )
+    column_name = sort_columns[sort]
+    return None if column_name is None else getattr(model, column_name)
+
+def _key_columns(model, sort_column) -> list:
+    return [model.id] if sort_column is None else [sort_column, model.id]
+
+def keyset_query(stmt, model, cursor: Optional[str], limit: int, sort_column=None, descending: bool = False):
+    """
+    Restrict `stmt` to one keyset page ordered by `(sort_column, id)`, or by
+    `id` alone, ascending or (with `descending`) newest first.
+
+    Instead of OFFSET, each page starts strictly after the key of the last row
+    of the previous page, so the database can seek straight into the index no
+    matter how deep the client has paged. An empty cursor starts from the
+    first page. One extra row is fetched so `split_page` can tell whether
+    another page exists.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return keyset_order(stmt, model, cursor, sort_column, descending).limit(limit + 1)
+
+def keyset_order(stmt, model, cursor: Optional[str], sort_column=None, descending: bool = False):
+    """
+    Every row after `cursor` in keyset order, without a page limit (for streaming).
+
+    Rows whose sort column is NULL come last in either direction, ordered by
+    id. A plain `(sort_column, id) > cursor` comparison is never true for
+    NULL, so the predicate spells them out instead of silently dropping them.
+    """
+    after = (lambda column, value: column < value) if descending else (lambda column, value: column > value)
+    if cursor:
+        last = decode_cursor(cursor, len(_key_columns(model, sort_column)))
+        if sort_column is None:
+            stmt = stmt.where(after(model.id, last[0]))
+        elif last[0] is None:
+            stmt = stmt.where(sort_column.is_(None), after(model.id, last[1]))
+        else:
+            stmt = stmt.where(or_(
+                after(sort_column, last[0]),
+                and_(sort_column == last[0], after(model.id, last[1])),
+                sort_column.is_(None)
+            ))
+    if sort_column is not None:
+        stmt = stmt.order_by((sort_column.desc() if descending else sort_column.asc()).nulls_last())
+    return stmt.order_by(model.id.desc() if descending else model.id)
+
+def split_page(rows: list, model, limit: int, sort_column=None) -> Tuple[list, Optional[str]]:
+    """
+    Trim the rows fetched by `keyset_query` to the page size and return them
+    with the cursor for the next page, which is None once the results run out.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last_row = rows[-1]
+    return rows, encode_cursor([getattr(last_row, column.key) for column in _key_columns(model, sort_column)])
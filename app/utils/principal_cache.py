@@ -0,0 +1,142 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.models import models
+from app.utils.redis_client import get_async_redis
+
+# "memory" keeps a per-worker LRU, "redis" shares one cache across every
+# uvicorn worker, "none" disables caching. Invalidation only reaches the
+# worker that made the change with "memory", so other workers keep serving a
+# deactivated or deleted patron until the entry expires; use "redis" with
+# several workers.
+PRINCIPAL_CACHE_BACKEND = os.getenv("PRINCIPAL_CACHE_BACKEND", "memory")
+# Seconds a principal stays cached; short by default for "memory", which
+# bounds how long a stale principal can outlive an update on other workers
+DEFAULT_PRINCIPAL_CACHE_TTL = {"memory": 5, "redis": 60}
+PRINCIPAL_CACHE_TTL = int(
+    os.getenv("PRINCIPAL_CACHE_TTL") or DEFAULT_PRINCIPAL_CACHE_TTL.get(PRINCIPAL_CACHE_BACKEND, 60)
+)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+PRINCIPAL_FIELDS = (
+    "id", "name", "email", "is_active", "is_superuser",
+    "membership_date", "created_at", "updated_at",
+)
+DATETIME_FIELDS = ("membership_date", "created_at", "updated_at")
+
+def snapshot(patron: models.Patron) -> Dict:
+    return {field: getattr(patron, field) for field in PRINCIPAL_FIELDS}
+
+def to_patron(data: Dict) -> models.Patron:
+    """
+    Rebuild a detached Patron from a cached snapshot. It is not attached to
+    any session; routes that modify the current user must load it first.
+    """
+    return models.Patron(**data)
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of resolved principals keyed by token subject (email),
+    so authenticated requests skip the Patron lookup. Routes that change or
+    delete a patron must call `invalidate` with its email.
+    """
+
+    def __init__(self, backend: str = PRINCIPAL_CACHE_BACKEND, ttl: int = PRINCIPAL_CACHE_TTL,
+                 max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _redis_key(subject: str) -> str:
+        return f"principal:{subject}"
+
+    async def get(self, subject: str) -> Optional[Dict]:
+        if self.backend == "none":
+            return None
+
+        data = None
+        if self.backend == "redis":
+            try:
+                raw = await get_async_redis().get(self._redis_key(subject))
+            except RedisError:
+                self.errors += 1
+                raw = None
+            if raw is not None:
+                data = json.loads(raw)
+                for field in DATETIME_FIELDS:
+                    if data[field] is not None:
+                        data[field] = datetime.fromisoformat(data[field])
+        else:
+            entry = self._entries.get(subject)
+            if entry is not None:
+                expires_at, cached = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(subject)
+                    data = cached
+                else:
+                    del self._entries[subject]
+
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    async def set(self, subject: str, data: Dict):
+        # Inactive patrons are rejected anyway; not caching them means a
+        # reactivation is seen at once, on every worker and either backend
+        if self.backend == "none" or not data["is_active"]:
+            return
+
+        if self.backend == "redis":
+            payload = {
+                field: value.isoformat() if isinstance(value, datetime) else value
+                for field, value in data.items()
+            }
+            try:
+                await get_async_redis().set(self._redis_key(subject), json.dumps(payload), ex=self.ttl)
+            except RedisError:
+                self.errors += 1
+            return
+
+        self._entries[subject] = (time.monotonic() + self.ttl, data)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, *subjects: str):
+        subjects = [subject for subject in subjects if subject]
+        if self.backend == "none" or not subjects:
+            return
+
+        if self.backend == "redis":
+            try:
+                await get_async_redis().delete(*(self._redis_key(subject) for subject in subjects))
+            except RedisError:
+                self.errors += 1
+            return
+
+        for subject in subjects:
+            self._entries.pop(subject, None)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "size": len(self._entries),
+        }
+
+principal_cache = PrincipalCache()
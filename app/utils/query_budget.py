@@ -0,0 +1,98 @@
+import os
+from typing import Optional
+
+from app.utils.metrics import request_queries
+
+# Report each request's SQL statement count and time as response headers.
+# Meant for development and CI; leave off in production.
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "false").lower() == "true"
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Query-Time-Ms"
+QUERY_BUDGET_HEADER = "X-DB-Query-Budget"
+
+def query_budget(max_queries: int):
+    """
+    Declare the most SQL statements an endpoint may run per request, cache
+    misses and the auth dependency included. Put it under the route
+    decorator; the function itself is returned unchanged.
+    """
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+def endpoint_budget(endpoint) -> Optional[int]:
+    return getattr(endpoint, "query_budget", None)
+
+class QueryBudgetMiddleware:
+    """
+    In debug mode, add the statement count and DB time of each request to
+    its response headers, along with the endpoint's declared budget, and log
+    requests that go over budget. Counting relies on the engine hooks in
+    app.utils.metrics; the counters are shared with PrometheusMiddleware
+    when it wraps this one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_DEBUG_HEADERS:
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        counters = request_queries.get()
+        if counters is None:
+            counters = [0, 0.0]
+            token = request_queries.set(counters)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER.lower().encode(), str(counters[0]).encode()))
+                headers.append((QUERY_TIME_HEADER.lower().encode(), f"{counters[1] * 1000:.2f}".encode()))
+                budget = endpoint_budget(scope.get("endpoint"))
+                if budget is not None:
+                    headers.append((QUERY_BUDGET_HEADER.lower().encode(), str(budget).encode()))
+                    if counters[0] > budget:
+                        print(f"Query budget exceeded: {scope['method']} {scope['path']} ran "
+                              f"{counters[0]} statements, budget {budget}")
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                request_queries.reset(token)
+
+def assert_within_budget(client, method: str, url: str, budget: Optional[int] = None, **kwargs):
+    """
+    Test helper: send one request through a TestClient and fail if it ran
+    more SQL statements than `budget`, or than the budget the endpoint
+    declared with @query_budget. Returns the response.
+
+        assert_within_budget(client, "GET", f"/books/{book.id}")
+    """
+    global QUERY_DEBUG_HEADERS
+    enabled, QUERY_DEBUG_HEADERS = QUERY_DEBUG_HEADERS, True
+    try:
+        response = client.request(method, url, **kwargs)
+    finally:
+        QUERY_DEBUG_HEADERS = enabled
+
+    if QUERY_COUNT_HEADER not in response.headers:
+        raise AssertionError("No query count header; is QueryBudgetMiddleware installed?")
+    count = int(response.headers[QUERY_COUNT_HEADER])
+    if budget is None:
+        if QUERY_BUDGET_HEADER not in response.headers:
+            raise AssertionError(f"{method} {url} declares no @query_budget; pass budget=")
+        budget = int(response.headers[QUERY_BUDGET_HEADER])
+    if count > budget:
+        raise AssertionError(
+            f"{method} {url} ran {count} SQL statements "
+            f"({response.headers[QUERY_TIME_HEADER]} ms), over its budget of {budget}"
+        )
+    return response
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.utils.metrics import (
+    DB_POOL_WAIT,
+    EVENT_LOOP_LAG,
+    HTTP_REQUESTS_RATE_LIMITED,
+    HTTP_REQUESTS_SHED,
+    match_route,
+)
+from app.utils.redis_client import get_async_redis
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Bucket size and refill period per route class, "requests/seconds": a client
+# may burst `requests` at once and regains them evenly over `seconds`
+DEFAULT_RATE_LIMITS = {
+    "auth": (10, 60),
+    "read": (600, 60),
+    "write": (120, 60),
+}
+# Overrides, e.g. "auth=5/60,write=300/60,POST /books/import=2/3600"; a key is
+# a route class or a "METHOD /path/template" for a single route
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# Give up on Redis after this long and let the request through
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.05"))
+# Never limited or shed, so health checks and scraping work under load
+UNLIMITED_PATHS = {"/health", "/metrics"}
+
+# Shed new requests with a 503 while the smoothed event loop lag or wait for a
+# pooled database connection is above these (milliseconds; 0 disables)
+SHED_LOOP_LAG_MS = float(os.getenv("SHED_LOOP_LAG_MS", "250"))
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", "500"))
+# How often the event loop lag is sampled, in seconds
+LOOP_LAG_INTERVAL = 0.1
+# Without new samples, a smoothed value halves this often (seconds), so
+# shedding stops once the overload clears even if requests stopped flowing
+LOAD_HALF_LIFE = 1.0
+
+# Token bucket, refilled from the Redis clock so every worker agrees on time.
+# Returns {allowed, ms until a token is available}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {allowed, wait}
+"""
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[int, float]]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.rpartition("=")
+        requests, _, seconds = value.partition("/")
+        limits[key.strip()] = (int(requests), float(seconds or 1))
+    return limits
+
+rate_limits = parse_rate_limits(RATE_LIMITS)
+
+def rate_limit(route_class: str):
+    """
+    Put an endpoint in a rate limit class other than the default "read"
+    (GET) or "write" (anything else). Goes under the route decorator.
+    """
+    def decorator(func):
+        func.rate_limit_class = route_class
+        return func
+    return decorator
+
+def error_response(status: int, detail: str, retry_after: int):
+    body = json.dumps({"detail": detail}).encode()
+    start = {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+class RateLimitMiddleware:
+    """
+    Token-bucket rate limiting per client address and route class, with the
+    buckets in Redis so the limit holds across every worker process. A
+    request over the limit gets a 429 with Retry-After. If Redis is slow or
+    unreachable the request is let through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.redis_failing = False
+
+    def limit_for(self, scope) -> Optional[Tuple[str, Tuple[int, float]]]:
+        route = match_route(scope["app"], scope)
+        if route is None:
+            return None
+        override = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+        if override in rate_limits:
+            return override, rate_limits[override]
+        route_class = getattr(getattr(route, "endpoint", None), "rate_limit_class", None)
+        if route_class is None:
+            route_class = "read" if scope["method"] in ("GET", "HEAD", "OPTIONS") else "write"
+        limit = rate_limits.get(route_class)
+        return None if limit is None else (route_class, limit)
+
+    async def take_token(self, key: str, capacity: int, period: float) -> Tuple[bool, int]:
+        try:
+            allowed, wait_ms = await asyncio.wait_for(
+                get_async_redis().eval(TOKEN_BUCKET_SCRIPT, 1, key, capacity, capacity / period / 1000),
+                RATE_LIMIT_REDIS_TIMEOUT
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            if not self.redis_failing:
+                print(f"Rate limiter cannot reach Redis, letting requests through: {str(e) or type(e).__name__}")
+                self.redis_failing = True
+            return True, 0
+        if self.redis_failing:
+            print("Rate limiter reconnected to Redis")
+            self.redis_failing = False
+        return bool(allowed), int(wait_ms)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limit_for(scope)
+        if limit is not None:
+            name, (capacity, period) = limit
+            client = scope["client"][0] if scope.get("client") else "unknown"
+            allowed, wait_ms = await self.take_token(f"ratelimit:{name}:{client}", capacity, period)
+            if not allowed:
+                HTTP_REQUESTS_RATE_LIMITED.labels(limit=name).inc()
+                start, body = error_response(429, "Too many requests", max(1, math.ceil(wait_ms / 1000)))
+                await send(start)
+                await send(body)
+                return
+        await self.app(scope, receive, send)
+
+class DecayingAverage:
+    """Exponentially weighted moving average that decays toward zero between samples."""
+
+    def __init__(self, alpha: float = 0.2, half_life: float = LOAD_HALF_LIFE):
+        self.alpha = alpha
+        self.half_life = half_life
+        self._value = 0.0
+        self._at = time.monotonic()
+
+    def value(self) -> float:
+        return self._value * 0.5 ** ((time.monotonic() - self._at) / self.half_life)
+
+    def add(self, sample: float):
+        current = self.value()
+        self._value = current + self.alpha * (sample - current)
+        self._at = time.monotonic()
+
+class LoadMonitor:
+    """Smoothed event loop lag and DB pool wait of this process."""
+
+    def __init__(self):
+        self.loop_lag = DecayingAverage()
+        self.pool_wait = DecayingAverage()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def record_pool_wait(self, seconds: float):
+        self.pool_wait.add(seconds)
+        DB_POOL_WAIT.set(self.pool_wait.value())
+
+    def ensure_watching(self):
+        loop = asyncio.get_running_loop()
+        if self._watcher is None or self._watcher.done() or self._watcher.get_loop() is not loop:
+            self._watcher = loop.create_task(self._watch_loop())
+
+    async def _watch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.loop_lag.add(max(0.0, loop.time() - started - LOOP_LAG_INTERVAL))
+            EVENT_LOOP_LAG.set(self.loop_lag.value())
+
+    def overload(self) -> Optional[str]:
+        """Why new requests should be shed right now, if they should."""
+        if SHED_LOOP_LAG_MS and self.loop_lag.value() * 1000 > SHED_LOOP_LAG_MS:
+            return "event_loop_lag"
+        if SHED_POOL_WAIT_MS and self.pool_wait.value() * 1000 > SHED_POOL_WAIT_MS:
+            return "db_pool_wait"
+        return None
+
+load_monitor = LoadMonitor()
+
+class LoadSheddingMiddleware:
+    """
+    Answer 503 straight away while the process is overloaded, instead of
+    queueing more work behind a stalled event loop or an exhausted database
+    pool; clients retry after a second, once the averages have decayed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        load_monitor.ensure_watching()
+        reason = load_monitor.overload()
+        if reason is not None:
+            HTTP_REQUESTS_SHED.labels(reason=reason).inc()
+            start, body = error_response(503, "Server overloaded, retry shortly", 1)
+            await send(start)
+            await send(body)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,24 @@
+import os
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+_redis: Optional[redis.Redis] = None
+_async_redis: Optional[aioredis.Redis] = None
+
+def get_redis() -> redis.Redis:
+    """Shared sync Redis client, for Celery tasks and other blocking code."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+def get_async_redis() -> aioredis.Redis:
+    """Shared asyncio Redis client, for use inside the API's event loop."""
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _async_redis
@@ -0,0 +1,91 @@
+import csv
+import os
+from typing import Dict, Iterable, List, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+REPORT_FORMATS = ("xlsx", "csv", "parquet")
+# Rows buffered per Parquet row group
+PARQUET_BATCH_SIZE = 10000
+
+def write_csv(path: str, columns: Sequence[str], rows: Iterable[Sequence]):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+
+def parquet_schema(columns: Dict[str, str]):
+    types = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[type_name]) for name, type_name in columns.items()])
+
+def write_parquet(path: str, columns: Dict[str, str], rows: Iterable[Sequence]):
+    """
+    Write `rows` in row groups of PARQUET_BATCH_SIZE under a schema built
+    from `columns` (name: type), so every batch, and an empty report, gets
+    the same column types whatever values it happens to hold.
+    """
+    schema = parquet_schema(columns)
+    names = list(columns)
+
+    def flush(batch: List[Sequence]):
+        writer.write_table(pa.Table.from_pylist([dict(zip(names, row)) for row in batch], schema=schema))
+
+    batch = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+def write_xlsx(path: str, sheets: Dict[str, tuple]):
+    """
+    Write `{sheet name: (columns, rows)}` with openpyxl's write-only mode,
+    which streams rows to disk instead of holding every cell in memory.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for title, (columns, rows) in sheets.items():
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(list(columns))
+        for row in rows:
+            sheet.append(list(row))
+    workbook.save(path)
+
+def write_report(base_path: str, fmt: str, columns: Dict[str, str], rows: Iterable[Sequence],
+                 statistics: List[tuple]) -> str:
+    """
+    Stream `rows` into a report at `base_path` plus the format's extension
+    and return its path. `columns` maps each column name to its type
+    (string, int, float, bool or timestamp), used by Parquet. xlsx reports
+    get the statistics as a second sheet; csv and parquet reports get a
+    `_statistics.csv` file next to them.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report format '{fmt}', expected one of: {', '.join(REPORT_FORMATS)}")
+
+    path = f"{base_path}.{fmt}"
+    if fmt == "xlsx":
+        write_xlsx(path, {
+            "Checkouts": (columns, rows),
+            "Statistics": (("Metric", "Value"), statistics),
+        })
+        return path
+
+    if fmt == "csv":
+        write_csv(path, columns, rows)
+    else:
+        write_parquet(path, columns, rows)
+    write_csv(f"{os.path.splitext(path)[0]}_statistics.csv", ("Metric", "Value"), statistics)
+    return path
@@ -0,0 +1,81 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+# Total bytes of serialized responses kept per worker; 0 disables the cache
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+def make_etag(*parts) -> str:
+    """Weak ETag derived from the version information of a representation."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches `etag` (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def cache_key(request: Request) -> str:
+    return f"{request.url.path}?{request.url.query}"
+
+class ResponseCache:
+    """
+    Size-bounded LRU of serialized response bodies, each stored with the
+    ETag it was built for. A lookup only hits when the caller's current
+    ETag matches, so a stale body is never served even if another worker
+    changed the row; write routes still invalidate their resources so
+    outdated bodies do not sit in memory.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[str, bytes, str]]" = OrderedDict()
+        self._keys_by_resource: Dict[str, Set[str]] = {}
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != etag:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, etag: str, body: bytes, resource: str):
+        if len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (etag, body, resource)
+        self._keys_by_resource.setdefault(resource, set()).add(key)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *resources: str):
+        for resource in resources:
+            for key in list(self._keys_by_resource.get(resource, ())):
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, body, resource = entry
+        self.size -= len(body)
+        keys = self._keys_by_resource.get(resource)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_resource[resource]
+
+response_cache = ResponseCache()
@@ -0,0 +1,77 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, or_, select, table
+
+from app.models import models
+
+# The full-text document of a book. Its GIN index, the trigram indexes and
+# the SQLite FTS5 table are created by migration 0005, which builds the index
+# from this same expression so queries can use it.
+BOOK_SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(books.title, '') || ' ' || "
+    "coalesce(books.author, '') || ' ' || coalesce(books.isbn, ''))"
+)
+# Postgres search indexes, which live outside the models' metadata
+BOOK_SEARCH_INDEXES = ("ix_books_search_document", "ix_books_title_trgm", "ix_books_author_trgm")
+
+# Trigram similarity a title/author needs to count as a fuzzy match
+FUZZY_MATCH_WEIGHT = 0.5
+
+books_fts = table("books_fts", column("rowid"))
+
+def _fts5_match_expression(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query of quoted prefix terms, all required."""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _postgres_search(q: str):
+    document = literal_column(BOOK_SEARCH_DOCUMENT)
+    ts_query = func.websearch_to_tsquery(literal_column("'simple'"), q)
+    similarity = func.greatest(
+        func.similarity(models.Book.title, q),
+        func.similarity(models.Book.author, q)
+    )
+    rank = func.ts_rank_cd(document, ts_query) + FUZZY_MATCH_WEIGHT * similarity
+    return (
+        select(models.Book)
+        .where(or_(
+            document.op("@@")(ts_query),
+            models.Book.title.op("%")(q),
+            models.Book.author.op("%")(q),
+            models.Book.isbn == q
+        ))
+        .order_by(rank.desc(), models.Book.id)
+    )
+
+def _sqlite_search(match: str):
+    fts = literal_column("books_fts")
+    return (
+        select(models.Book)
+        .join(books_fts, books_fts.c.rowid == models.Book.id)
+        .where(fts.op("MATCH")(match))
+        .order_by(func.bm25(fts), models.Book.id)
+    )
+
+def build_book_search_query(dialect_name: str, q: str, available_only: bool = False, limit: int = 20):
+    """
+    Build a ranked book search over title, author and isbn for the given
+    database dialect, or return None when `q` has nothing to search for.
+
+    Postgres combines the full-text index with trigram similarity, so typos
+    in titles and authors still match. SQLite uses the FTS5 table with prefix
+    matching, which is enough for local development.
+    """
+    if dialect_name == "postgresql":
+        stmt = _postgres_search(q)
+    else:
+        match = _fts5_match_expression(q)
+        if match is None:
+            return None
+        stmt = _sqlite_search(match)
+
+    if available_only:
+        stmt = stmt.where(models.Book.available_quantity > 0)
+    return stmt.limit(limit)
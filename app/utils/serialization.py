@@ -0,0 +1,52 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Rows fetched per round trip from the server-side cursor when streaming
+STREAM_BATCH_SIZE = 1000
+
+# List routes select plain columns and encode the row tuples with orjson,
+# skipping ORM object construction and Pydantic validation. Dates come out in
+# the same ISO format Pydantic uses, so responses are unchanged.
+
+def schema_columns(model, schema) -> list:
+    """The model columns behind a response schema's fields, in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+def schema_fields(schema) -> List[str]:
+    return list(schema.model_fields)
+
+def row_dicts(rows: Iterable[Sequence[Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """
+    Pair each row's leading values with `fields`. Columns selected after
+    the schema's own (sort keys, versions) are left out.
+    """
+    return [dict(zip(fields, row)) for row in rows]
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=orjson.dumps(content), media_type="application/json", headers=headers)
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(engine, stmt, fields: List[str]) -> StreamingResponse:
+    """
+    Stream the rows of `stmt` as newline-delimited JSON, one object per row,
+    straight off a server-side cursor, so memory stays flat however many rows
+    there are. The rows are read on a connection of their own from `engine`
+    (pass the request session's `bind`): the request's session is closed
+    before a streamed body is sent.
+    """
+    async def lines():
+        async with engine.connect() as conn:
+            result = await conn.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for partition in result.partitions():
+                yield b"".join(
+                    orjson.dumps(dict(zip(fields, row)), option=orjson.OPT_APPEND_NEWLINE)
+                    for row in partition
+                )
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
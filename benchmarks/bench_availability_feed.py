@@ -0,0 +1,77 @@
+"""
+Open many idle WebSocket subscribers on the availability feed of a running
+server, then check a book out and back in and measure how long the change
+takes to reach every subscriber.
+
+    uvicorn main:app --workers 4
+    python -m benchmarks.bench_availability_feed --base-url http://localhost:8000 --subscribers 10000
+
+Raise the open file limit (ulimit -n) for large subscriber counts.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+import websockets
+
+async def subscribe(ws_url: str, book_id: int, opened: list):
+    websocket = await websockets.connect(f"{ws_url}/ws/books/availability?ids={book_id}", max_queue=None)
+    await websocket.recv()  # initial snapshot
+    opened.append(websocket)
+
+async def wait_for_change(websocket, book_id: int, expected: int, started: float) -> float:
+    while True:
+        message = json.loads(await websocket.recv())
+        if message.get("availability", {}).get(str(book_id)) == expected:
+            return (time.perf_counter() - started) * 1000
+
+async def run(args):
+    ws_url = args.base_url.replace("http", "ws", 1)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        run_id = uuid.uuid4().hex[:12]
+        book = (await client.post("/books/", json={
+            "title": f"Feed {run_id}", "author": "Feed Benchmark", "isbn": f"feed-{run_id}", "quantity": 5
+        })).json()
+        patron = (await client.post("/patrons/", json={
+            "name": "Feed Benchmark", "email": f"feed-{run_id}@example.com", "password": run_id
+        })).json()
+
+        opened = []
+        started = time.perf_counter()
+        for start in range(0, args.subscribers, args.connect_batch):
+            batch = range(start, min(start + args.connect_batch, args.subscribers))
+            await asyncio.gather(*(subscribe(ws_url, book["id"], opened) for _ in batch))
+        print(f"Opened {len(opened)} subscribers in {time.perf_counter() - started:.1f}s")
+
+        try:
+            for round_number in range(args.rounds):
+                started = time.perf_counter()
+                checkout = (await client.post("/checkouts/", json={
+                    "book_id": book["id"], "patron_id": patron["id"], "due_date": "2099-01-01T00:00:00"
+                })).json()
+                latencies = sorted(await asyncio.gather(*(
+                    wait_for_change(websocket, book["id"], 4, started) for websocket in opened
+                )))
+                print(f"round {round_number + 1}: p50 {statistics.median(latencies):.1f} ms, "
+                      f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, "
+                      f"all delivered in {latencies[-1]:.1f} ms")
+                await client.post(f"/checkouts/{checkout['id']}/return", params={"patron_id": patron["id"]})
+                await asyncio.gather(*(wait_for_change(websocket, book["id"], 5, started) for websocket in opened))
+        finally:
+            await asyncio.gather(*(websocket.close() for websocket in opened))
+
+def main():
+    parser = argparse.ArgumentParser(description="Availability feed fan-out benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
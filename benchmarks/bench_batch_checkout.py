@@ -0,0 +1,101 @@
+"""
+Compare checking out and returning a kiosk stack of books one request per
+item against the batch endpoints, which do it in one transaction each.
+
+Runs against main.app in process (set DATABASE_URL) or a running server:
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.bench_batch_checkout --stack 10
+    python -m benchmarks.bench_batch_checkout --base-url http://localhost:8000 --rounds 200
+
+Creates its own books and patron; every checkout is returned again.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+def make_client(base_url) -> httpx.AsyncClient:
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=60)
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+async def create_fixtures(client: httpx.AsyncClient, stack: int):
+    run_id = uuid.uuid4().hex[:12]
+    book_ids = []
+    for i in range(stack):
+        response = await client.post("/books/", json={
+            "title": f"Batch {run_id} {i}",
+            "author": "Batch Benchmark",
+            "isbn": f"batch-{run_id}-{i}",
+            "quantity": 5,
+        })
+        response.raise_for_status()
+        book_ids.append(response.json()["id"])
+    response = await client.post("/patrons/", json={
+        "name": "Batch Benchmark",
+        "email": f"batch-{run_id}@example.com",
+        "password": run_id,
+    })
+    response.raise_for_status()
+    return book_ids, response.json()["id"]
+
+async def sequential_round(client, book_ids, patron_id):
+    checkout_ids = []
+    for book_id in book_ids:
+        response = await client.post("/checkouts/", json={
+            "book_id": book_id, "patron_id": patron_id, "due_date": "2099-01-01T00:00:00"
+        })
+        response.raise_for_status()
+        checkout_ids.append(response.json()["id"])
+    for checkout_id in checkout_ids:
+        response = await client.post(f"/checkouts/{checkout_id}/return", params={"patron_id": patron_id})
+        response.raise_for_status()
+
+async def batch_round(client, book_ids, patron_id):
+    response = await client.post("/checkouts/batch", json={"patron_id": patron_id, "book_ids": book_ids})
+    response.raise_for_status()
+    checkout_ids = [item["checkout"]["id"] for item in response.json()["items"]]
+    response = await client.post("/checkouts/batch/return", json={
+        "patron_id": patron_id, "checkout_ids": checkout_ids
+    })
+    response.raise_for_status()
+
+async def time_rounds(round_fn, client, book_ids, patron_id, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await round_fn(client, book_ids, patron_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+async def run(args):
+    async with make_client(args.base_url) as client:
+        book_ids, patron_id = await create_fixtures(client, args.stack)
+        # Warm up connections and caches for both paths
+        await sequential_round(client, book_ids, patron_id)
+        await batch_round(client, book_ids, patron_id)
+
+        print(f"{args.stack} books checked out and returned, {args.rounds} rounds each")
+        print(f"{'mode':<12} {'p50 ms':>10} {'p95 ms':>10}")
+        sequential = await time_rounds(sequential_round, client, book_ids, patron_id, args.rounds)
+        print(f"{'sequential':<12} {sequential[0]:>10.2f} {sequential[1]:>10.2f}")
+        batch = await time_rounds(batch_round, client, book_ids, patron_id, args.rounds)
+        print(f"{'batch':<12} {batch[0]:>10.2f} {batch[1]:>10.2f}")
+        print(f"Batch is {sequential[0] / batch[0]:.1f}x faster at p50")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch vs sequential checkout and return")
+    parser.add_argument("--base-url", help="running server to target; defaults to main.app in process")
+    parser.add_argument("--stack", type=int, default=10, help="books per kiosk stack")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure requests/sec and latency of the API under concurrent clients.
+
+Start the API (one uvicorn worker makes event-loop blocking easy to see),
+then run this against it, once on the commit before the async database
+layer and once after:
+
+    uvicorn main:app --workers 1
+    python -m benchmarks.bench_concurrency --base-url http://localhost:8000 \
+        --concurrency 64 --duration 20 --path /books/?limit=50 --path /books/1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+async def client_loop(client: httpx.AsyncClient, paths, deadline: float, latencies: list, errors: list):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+async def run(base_url: str, paths, concurrency: int, duration: float):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            client_loop(client, paths, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent throughput benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    paths = args.paths or ["/books/?limit=50"]
+    latencies, errors, elapsed = asyncio.run(run(args.base_url, paths, args.concurrency, args.duration))
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors)")
+        return
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"requests:    {len(latencies)} ok, {len(errors)} errors in {elapsed:.1f}s")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms:  p50={quantiles[49]:.1f} p95={quantiles[94]:.1f} p99={quantiles[98]:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Check that a burst of logins does not stall the rest of the API.
+
+A probe loop keeps hitting a cheap endpoint while many clients log in at
+once. The probe's latency is reported for a quiet baseline and during the
+storm; with hashing off the event loop its p99 should barely move.
+
+    python -m app.management_commands.create_superuser --email storm@example.com --password storm
+    uvicorn main:app --workers 1
+    python -m benchmarks.bench_login_storm --base-url http://localhost:8000 \
+        --email storm@example.com --password storm --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+def summarize(samples) -> str:
+    if len(samples) < 2:
+        return f"n={len(samples)}"
+    q = statistics.quantiles(samples, n=100)
+    return f"n={len(samples)} p50={q[49]:.1f}ms p95={q[94]:.1f}ms p99={q[98]:.1f}ms"
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+async def login(client: httpx.AsyncClient, email: str, password: str, semaphore: asyncio.Semaphore, samples: list):
+    async with semaphore:
+        started = time.perf_counter()
+        response = await client.post("/token", data={"username": email, "password": password})
+        response.raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120) as client:
+        baseline, during, logins = [], [], []
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, stop, baseline))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        await probe_task
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, args.probe_path, stop, during))
+        semaphore = asyncio.Semaphore(args.concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            login(client, args.email, args.password, semaphore, logins)
+            for _ in range(args.logins)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+
+    print(f"probe {args.probe_path} baseline:     {summarize(baseline)}")
+    print(f"probe {args.probe_path} during storm: {summarize(during)}")
+    print(f"logins: {summarize(logins)} ({len(logins) / elapsed:.1f} logins/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the list-response paths on checkouts: ORM objects validated into
+Pydantic models and JSON-encoded (the old response_model path) versus row
+tuples encoded with orjson, and the peak memory of exporting every row as
+one JSON list versus streaming NDJSON off a server-side cursor.
+
+    python -m benchmarks.seed --database-url sqlite:///./bench.db
+    python -m benchmarks.bench_serialization --database-url sqlite:///./bench.db --rows 100000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.database.database import to_async_url
+from app.models import models
+from app.schemas import schemas
+from app.utils.serialization import json_response, ndjson_response, row_dicts, schema_columns, schema_fields
+
+CHECKOUT_LIST = TypeAdapter(list[schemas.Checkout])
+
+async def orm_pydantic(engine, limit: int) -> bytes:
+    async with AsyncSession(engine) as db:
+        checkouts = (await db.scalars(select(models.Checkout).limit(limit))).all()
+        return CHECKOUT_LIST.dump_json(CHECKOUT_LIST.validate_python(checkouts, from_attributes=True))
+
+async def rows_orjson(engine, limit: int) -> bytes:
+    fields = schema_fields(schemas.Checkout)
+    async with AsyncSession(engine) as db:
+        rows = (await db.execute(select(*schema_columns(models.Checkout, schemas.Checkout)).limit(limit))).all()
+        return json_response(row_dicts(rows, fields)).body
+
+async def stream_ndjson(engine, limit: int) -> int:
+    stmt = select(*schema_columns(models.Checkout, schemas.Checkout)).order_by(models.Checkout.id).limit(limit)
+    response = ndjson_response(engine, stmt, schema_fields(schemas.Checkout))
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+async def timed(fn, engine, limit: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn(engine, limit)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+async def peak_memory(fn, engine, limit: int) -> float:
+    tracemalloc.start()
+    await fn(engine, limit)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+async def run(args):
+    engine = create_async_engine(to_async_url(args.database_url))
+    print(f"{'rows':>8} {'orm+pydantic ms':>16} {'rows+orjson ms':>15}")
+    for limit in (100, 1000, 10000):
+        before = await timed(orm_pydantic, engine, limit, args.repeat)
+        after = await timed(rows_orjson, engine, limit, args.repeat)
+        print(f"{limit:>8} {before:>16.2f} {after:>15.2f}")
+
+    print(f"\nPeak memory exporting {args.rows} checkouts:")
+    for label, fn in (("orm+pydantic list", orm_pydantic), ("rows+orjson list", rows_orjson),
+                      ("ndjson stream", stream_ndjson)):
+        print(f"  {label:<20} {await peak_memory(fn, engine, args.rows):>8.1f} MiB")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list serialization paths")
+    parser.add_argument("--database-url", default="sqlite:///./bench.db")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare one-connection-per-message delivery (send_email) with the pooled
+send_many batch API against a local aiosmtpd stand-in server.
+
+    pip install aiosmtpd
+    python -m benchmarks.bench_smtp --messages 2000 --pool-size 8 --latency-ms 5
+
+--latency-ms adds a per-command delay to the stand-in server to mimic the
+round trips of a real, remote SMTP relay.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP delivery benchmark")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Point the mailer at the stand-in server before it reads its settings
+    os.environ.update({
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(args.port),
+        "SMTP_USE_TLS": "false",
+        "SMTP_USERNAME": "",
+    })
+    from aiosmtpd.controller import Controller
+    from app.utils import email
+
+    class Handler:
+        received = 0
+
+        async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+            await asyncio.sleep(args.latency_ms / 1000)
+            envelope.rcpt_tos.append(address)
+            return "250 OK"
+
+        async def handle_DATA(self, server, session, envelope):
+            await asyncio.sleep(args.latency_ms / 1000)
+            Handler.received += 1
+            return "250 Message accepted for delivery"
+
+    controller = Controller(Handler(), hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        template_data = {"patron_name": "Bench", "due_books": []}
+        recipients = [f"patron{i}@example.com" for i in range(args.messages)]
+
+        async def sequential():
+            for to_email in recipients:
+                await email.send_email(to_email, "Bench", "due_soon_notice", template_data)
+
+        async def pooled():
+            await email.send_many(
+                [email.build_message(to_email, "Bench", "due_soon_notice", template_data) for to_email in recipients],
+                pool_size=args.pool_size
+            )
+
+        for name, run in (("send_email, one connection each", sequential), (f"send_many, pool of {args.pool_size}", pooled)):
+            Handler.received = 0
+            started = time.perf_counter()
+            asyncio.run(run())
+            elapsed = time.perf_counter() - started
+            print(f"{name:<36} {Handler.received} delivered in {elapsed:.2f}s "
+                  f"({Handler.received / elapsed:.0f} msg/s)")
+    finally:
+        controller.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Drive the API with concurrent clients over a weighted mix of book, patron,
+checkout and auth routes, and report throughput and p50/p95/p99 latency per
+endpoint as JSON.
+
+Seed a database with benchmarks.seed first. Then either run the app in
+process (the client talks to `main.app` over ASGI, no server needed) or
+point --base-url at a running server:
+
+    python -m benchmarks.seed --database-url sqlite:///./bench.db
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.load --duration 30 --output before.json
+    # ...check out another commit, then...
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.load --duration 30 \
+        --output after.json --compare before.json
+
+Pass the same --books/--patrons sizes the database was seeded with, so
+generated ids exist. Checkouts made during the run are returned straight
+away, so repeated runs see the same data.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.seed import BENCH_PASSWORD, TITLE_WORDS
+
+# Patrons logged in before the run; authenticated requests pick one of their tokens
+TOKEN_POOL_SIZE = 20
+
+def percentile(sorted_samples, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(q / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+class Scenario:
+    """The weighted endpoint mix, with ids drawn from the seeded ranges."""
+
+    def __init__(self, books: int, patrons: int, rng: random.Random):
+        self.books = books
+        self.patrons = patrons
+        self.rng = rng
+        self.tokens = {}
+        self.endpoints = [
+            ("GET /books/ (offset)", 10, self.list_books_offset),
+            ("GET /books/ (cursor)", 10, self.list_books_cursor),
+            ("GET /books/{book_id}", 20, self.read_book),
+            ("GET /books/search", 10, self.search_books),
+            ("GET /books/availability", 10, self.book_availability),
+            ("GET /patrons/ (cursor)", 5, self.list_patrons_cursor),
+            ("GET /patrons/{patron_id}", 15, self.read_patron),
+            ("POST /token", 2, self.login),
+            ("GET /users/me/", 10, self.read_me),
+            ("POST /checkouts/ + return", 8, self.checkout_and_return),
+            ("GET /admin/checkouts/all (cursor)", 2, self.admin_checkouts),
+        ]
+        self.weights = [weight for _, weight, _ in self.endpoints]
+
+    def pick(self):
+        return self.rng.choices(self.endpoints, weights=self.weights)[0]
+
+    async def log_in(self, client: httpx.AsyncClient, patron_id: int) -> httpx.Response:
+        response = await client.post("/token", data={
+            "username": f"patron{patron_id}@example.com", "password": BENCH_PASSWORD
+        })
+        if response.status_code == 200:
+            self.tokens[patron_id] = response.json()["access_token"]
+        return response
+
+    async def prepare(self, client: httpx.AsyncClient):
+        """Log in the patrons whose tokens authenticated requests reuse, before timing starts."""
+        for patron_id in range(1, min(self.patrons, TOKEN_POOL_SIZE) + 1):
+            (await self.log_in(client, patron_id)).raise_for_status()
+
+    async def login(self, client):
+        return [await self.log_in(client, self.rng.randint(1, self.patrons))]
+
+    async def list_books_offset(self, client):
+        return [await client.get("/books/", params={"skip": self.rng.randrange(0, 1000), "limit": 50})]
+
+    async def list_books_cursor(self, client):
+        return [await client.get("/books/", params={"cursor": "", "limit": 50, "sort": "title"})]
+
+    async def read_book(self, client):
+        return [await client.get(f"/books/{self.rng.randint(1, self.books)}")]
+
+    async def search_books(self, client):
+        return [await client.get("/books/search", params={"q": self.rng.choice(TITLE_WORDS).lower()})]
+
+    async def book_availability(self, client):
+        ids = [("ids", self.rng.randint(1, self.books)) for _ in range(20)]
+        return [await client.get("/books/availability", params=ids)]
+
+    async def list_patrons_cursor(self, client):
+        return [await client.get("/patrons/", params={"cursor": "", "limit": 50})]
+
+    async def read_patron(self, client):
+        return [await client.get(f"/patrons/{self.rng.randint(1, self.patrons)}")]
+
+    async def read_me(self, client):
+        token = self.tokens[self.rng.randint(1, min(self.patrons, TOKEN_POOL_SIZE))]
+        return [await client.get("/users/me/", headers={"Authorization": f"Bearer {token}"})]
+
+    async def checkout_and_return(self, client):
+        patron_id = self.rng.randint(1, self.patrons)
+        checkout = await client.post("/checkouts/", json={
+            "book_id": self.rng.randint(1, self.books),
+            "patron_id": patron_id,
+            "due_date": (datetime.utcnow() + timedelta(days=14)).isoformat()
+        })
+        if checkout.status_code != 200:
+            # An unavailable book is an expected answer, not a failure
+            return [checkout]
+        returned = await client.post(f"/checkouts/{checkout.json()['id']}/return", params={"patron_id": patron_id})
+        return [checkout, returned]
+
+    async def admin_checkouts(self, client):
+        token = self.tokens[1]
+        return [await client.get("/admin/checkouts/all", params={"cursor": "", "limit": 50},
+                                 headers={"Authorization": f"Bearer {token}"})]
+
+async def client_loop(client, scenario: Scenario, deadline: float, samples: dict, errors: dict):
+    while time.perf_counter() < deadline:
+        name, _, call = scenario.pick()
+        started = time.perf_counter()
+        try:
+            responses = await call(client)
+        except httpx.HTTPError as e:
+            errors.setdefault(name, []).append(type(e).__name__)
+            continue
+        elapsed = (time.perf_counter() - started) * 1000
+        # 400/404 are expected answers (an unavailable book); anything else is a broken request
+        failed = [r.status_code for r in responses if r.status_code >= 500 or r.status_code in (401, 403, 422)]
+        if failed:
+            errors.setdefault(name, []).extend(failed)
+        else:
+            samples.setdefault(name, []).append(elapsed)
+
+def make_client(base_url, concurrency: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+def summarize(samples: dict, errors: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(name, []))
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": len(errors.get(name, [])),
+            "throughput_rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+    all_latencies = sorted(sample for values in samples.values() for sample in values)
+    total = {
+        "requests": len(all_latencies),
+        "errors": sum(len(values) for values in errors.values()),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2),
+        "p50_ms": round(percentile(all_latencies, 50), 2),
+        "p95_ms": round(percentile(all_latencies, 95), 2),
+        "p99_ms": round(percentile(all_latencies, 99), 2),
+    }
+    return {"total": total, "endpoints": endpoints}
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(report: dict, baseline: dict):
+    """Print the change in throughput and p95 per endpoint against an earlier report."""
+    print(f"{'endpoint':<36} {'rps':>10} {'Δrps':>8} {'p95 ms':>10} {'Δp95':>8}")
+    for name, current in report["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            print(f"{name:<36} {current['throughput_rps']:>10.1f} {'new':>8} {current['p95_ms']:>10.1f} {'new':>8}")
+            continue
+        rps_change = (current["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0
+        p95_change = (current["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0
+        print(f"{name:<36} {current['throughput_rps']:>10.1f} {rps_change:>+7.1f}% "
+              f"{current['p95_ms']:>10.1f} {p95_change:>+7.1f}%")
+
+async def run(args) -> dict:
+    scenario = Scenario(args.books, args.patrons, random.Random(args.seed))
+    samples, errors = {}, {}
+    async with make_client(args.base_url, args.concurrency) as client:
+        await scenario.prepare(client)
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(client_loop(client, scenario, deadline, {}, {}) for _ in range(args.concurrency)))
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            client_loop(client, scenario, deadline, samples, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    report = summarize(samples, errors, elapsed)
+    report["meta"] = {
+        "commit": git_commit(),
+        "target": args.base_url or "in-process ASGI",
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "seed": args.seed,
+        "books": args.books,
+        "patrons": args.patrons,
+        "started_at": datetime.utcnow().isoformat(),
+    }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load benchmark across the API routes")
+    parser.add_argument("--base-url", help="running server to target; defaults to main.app in process")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--patrons", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to print deltas against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Fire thousands of simultaneous checkouts of one title from many threads and
+check that inventory stays consistent: exactly `quantity` checkouts succeed,
+the rest are refused, and every return puts exactly one copy back.
+
+    uvicorn main:app --workers 4
+    python -m benchmarks.stress_checkout --base-url http://localhost:8000 \
+        --requests 5000 --threads 64 --quantity 1000
+
+Exits with status 1 if any count is off.
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+_local = threading.local()
+
+def get_client(base_url: str) -> httpx.Client:
+    # One keep-alive client per worker thread
+    if not hasattr(_local, "client"):
+        _local.client = httpx.Client(base_url=base_url, timeout=30)
+    return _local.client
+
+def checkout(base_url: str, book_id: int, patron_id: int):
+    response = get_client(base_url).post("/checkouts/", json={
+        "book_id": book_id,
+        "patron_id": patron_id,
+        "due_date": "2099-01-01T00:00:00",
+    })
+    return response.status_code, response.json().get("id") if response.status_code == 200 else None
+
+def return_checkout(base_url: str, checkout_id: int, patron_id: int) -> int:
+    response = get_client(base_url).post(f"/checkouts/{checkout_id}/return", params={"patron_id": patron_id})
+    return response.status_code
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent checkout/return consistency stress test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--quantity", type=int, default=500)
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:12]
+    with httpx.Client(base_url=args.base_url, timeout=30) as client:
+        book = client.post("/books/", json={
+            "title": f"Stress {run_id}",
+            "author": "Stress Test",
+            "isbn": f"stress-{run_id}",
+            "quantity": args.quantity,
+        }).json()
+        patron = client.post("/patrons/", json={
+            "name": "Stress Test",
+            "email": f"stress-{run_id}@example.com",
+            "password": run_id,
+        }).json()
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(
+            lambda _: checkout(args.base_url, book["id"], patron["id"]),
+            range(args.requests)
+        ))
+        checkout_elapsed = time.perf_counter() - started
+
+        checkout_ids = [checkout_id for status, checkout_id in results if status == 200]
+        # Return every checkout twice; only the first return of each may count
+        started = time.perf_counter()
+        return_statuses = list(pool.map(
+            lambda checkout_id: return_checkout(args.base_url, checkout_id, patron["id"]),
+            checkout_ids + checkout_ids
+        ))
+        return_elapsed = time.perf_counter() - started
+
+    with httpx.Client(base_url=args.base_url, timeout=30) as client:
+        available_after = client.get(f"/books/{book['id']}").json()["available_quantity"]
+
+    checkout_statuses = Counter(status for status, _ in results)
+    return_counts = Counter(return_statuses)
+    expected_ok = min(args.requests, args.quantity)
+    print(f"checkouts: {dict(checkout_statuses)} in {checkout_elapsed:.2f}s "
+          f"({args.requests / checkout_elapsed:.0f} req/s)")
+    print(f"returns:   {dict(return_counts)} in {return_elapsed:.2f}s "
+          f"({len(return_statuses) / return_elapsed:.0f} req/s)")
+    print(f"available after returns: {available_after} (expected {args.quantity})")
+
+    failures = []
+    if checkout_statuses[200] != expected_ok:
+        failures.append(f"{checkout_statuses[200]} checkouts succeeded, expected {expected_ok}")
+    if checkout_statuses[400] != args.requests - expected_ok:
+        failures.append(f"{checkout_statuses[400]} checkouts refused, expected {args.requests - expected_ok}")
+    if return_counts[200] != len(checkout_ids):
+        failures.append(f"{return_counts[200]} returns succeeded, expected {len(checkout_ids)}")
+    if available_after != args.quantity:
+        failures.append(f"available_quantity is {available_after}, expected {args.quantity}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
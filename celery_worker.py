@@ -17,5 +17,13 @@ celery.conf.update(
 # Import tasks explicitly
 from app.tasks import library_tasks
 
+# One pooled database engine per worker process and one session per task
+from app.database.database import bind_celery_sessions
+bind_celery_sessions(celery)
+
+# Task duration, retry and failure metrics, served on CELERY_METRICS_PORT when set
+from app.utils.metrics import instrument_celery
+instrument_celery(port=int(os.getenv("CELERY_METRICS_PORT", "0")) or None)
+
 if __name__ == '__main__':
     celery.start()
@@ -1,10 +1,14 @@
-from fastapi import FastAPI, Depends, Security
+from fastapi import FastAPI, Depends, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, SecurityScopes
-from app.routes import books, patrons, checkouts, auth
+from app.routes import books, patrons, checkouts, auth, analytics, availability_feed
 from app.database.database import engine, recreate_database
 from app.management_commands.create_superuser import create_superuser
 from app.models import models
+from app.utils.metrics import PrometheusMiddleware, mark_process_dead, render_metrics
+from app.utils.query_budget import QueryBudgetMiddleware
+from app.utils.rate_limit import LoadSheddingMiddleware, RateLimitMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
 
 # Recreate database tables
 # recreate_database()
@@ -27,6 +31,14 @@ app = FastAPI(
     }
 )
 
+# Per-client token buckets in Redis (RATE_LIMITS); 429 once a bucket is empty
+app.add_middleware(RateLimitMiddleware)
+# 503 while event loop lag or DB pool wait is over its threshold, checked
+# before the rate limiter so an overloaded process makes no Redis calls.
+# Both sit inside CORS so browsers can read the rejections, and inside the
+# metrics middleware so rejected requests are still counted.
+app.add_middleware(LoadSheddingMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,11 +48,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SQL statement count/time headers in debug mode (QUERY_DEBUG_HEADERS=true)
+app.add_middleware(QueryBudgetMiddleware)
+# Route latency, in-flight requests and per-request SQL usage
+app.add_middleware(PrometheusMiddleware)
+
 # Include routers
 app.include_router(auth.router, tags=["authentication"])
+app.include_router(availability_feed.router, tags=["books"])
 app.include_router(books.router, tags=["books"])
 app.include_router(patrons.router, tags=["patrons"])
 app.include_router(checkouts.router, tags=["checkouts"])
+app.include_router(analytics.router, tags=["analytics"])
 
 # Global security
 app.swagger_ui_oauth2_redirect_url = "/docs/oauth2-redirect"
@@ -65,6 +84,14 @@ async def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.on_event("shutdown")
+def drop_process_metrics():
+    mark_process_dead()
+
 # Add security definitions
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
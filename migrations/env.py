@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.database.database import SQLALCHEMY_DATABASE_URL, Base
+from app.models import models  # noqa: F401 - registers the tables on Base.metadata
+from app.utils.search import BOOK_SEARCH_INDEXES
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+# DATABASE_URL, unless a caller set sqlalchemy.url on the Alembic config
+database_url = config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The search indexes and SQLite FTS5 tables are managed by the migrations
+    # themselves, not the models
+    if type_ == "table" and name.startswith("books_fts"):
+        return False
+    return not (type_ == "index" and name in BOOK_SEARCH_INDEXES)
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL for DATABASE_URL's dialect without connecting."""
+    context.configure(
+        url=database_url,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    connectable = create_engine(database_url, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite cannot ALTER most things in place; batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,71 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 06:36:55.138881
+
+The schema as `recreate_database()` created it before migrations existed:
+books, patrons and checkouts only. Databases created that way can be marked
+with `alembic stamp 0001`; `alembic upgrade head` then adds the rest.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'books',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('author', sa.String(), nullable=True),
+        sa.Column('isbn', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('available_quantity', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_books_id', 'books', ['id'])
+    op.create_index('ix_books_isbn', 'books', ['isbn'], unique=True)
+    op.create_index('ix_books_title', 'books', ['title'])
+
+    op.create_table(
+        'patrons',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.Column('membership_date', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_patrons_email', 'patrons', ['email'], unique=True)
+    op.create_index('ix_patrons_id', 'patrons', ['id'])
+    op.create_index('ix_patrons_name', 'patrons', ['name'])
+
+    op.create_table(
+        'checkouts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=True),
+        sa.Column('patron_id', sa.Integer(), nullable=True),
+        sa.Column('checkout_date', sa.DateTime(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('return_date', sa.DateTime(), nullable=True),
+        sa.Column('is_returned', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+        sa.ForeignKeyConstraint(['patron_id'], ['patrons.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_checkouts_id', 'checkouts', ['id'])
+
+def downgrade() -> None:
+    op.drop_table('checkouts')
+    op.drop_table('patrons')
+    op.drop_table('books')
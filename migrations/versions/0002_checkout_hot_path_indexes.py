@@ -0,0 +1,54 @@
+"""checkout hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 07:02:11.402517
+
+Composite and partial indexes for the queries that filter checkouts by
+patron, book, due date and return state. On Postgres they are built
+CONCURRENTLY so a live checkouts table is not locked for writes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    # A patron's checkouts, optionally only the open ones
+    ('ix_checkouts_patron_id_is_returned', ['patron_id', 'is_returned'], {}),
+    # A book's checkout history, paged by id
+    ('ix_checkouts_book_id_id', ['book_id', 'id'], {}),
+    # Overdue and due-soon scans only ever look at open checkouts
+    ('ix_checkouts_open_due_date', ['due_date'], {
+        'postgresql_where': sa.text('is_returned = false'),
+        'sqlite_where': sa.text('is_returned = 0'),
+    }),
+    # Weekly report and analytics rollups by checkout day
+    ('ix_checkouts_checkout_date', ['checkout_date'], {}),
+    # Analytics rollups by return day
+    ('ix_checkouts_return_date', ['return_date'], {
+        'postgresql_where': sa.text('return_date IS NOT NULL'),
+        'sqlite_where': sa.text('return_date IS NOT NULL'),
+    }),
+)
+
+def upgrade() -> None:
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    if concurrently:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, columns, options in INDEXES:
+                op.create_index(name, 'checkouts', columns, postgresql_concurrently=True,
+                                if_not_exists=True, **options)
+    else:
+        for name, columns, options in INDEXES:
+            op.create_index(name, 'checkouts', columns, if_not_exists=True, **options)
+
+def downgrade() -> None:
+    for name, _, _ in INDEXES:
+        op.drop_index(name, table_name='checkouts', if_exists=True)
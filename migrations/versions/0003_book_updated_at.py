@@ -0,0 +1,29 @@
+"""book updated_at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 07:30:12.518204
+
+Last-modified time of each book, which the catalog ETags and response
+cache key on. Existing rows start from the time of the migration.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Databases created by recreate_database() after the column was added
+    # already have it (SQLite has no ADD COLUMN IF NOT EXISTS)
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('books')}
+    if 'updated_at' not in columns:
+        op.add_column('books', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+def downgrade() -> None:
+    op.drop_column('books', 'updated_at')
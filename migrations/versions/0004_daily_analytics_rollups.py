@@ -0,0 +1,54 @@
+"""daily analytics rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 07:31:40.902371
+
+Per-day rollup tables behind the analytics routes and monthly report. They
+start empty; the nightly rollup task fills every closed day not rolled up
+yet, and analytics reads the days it has not reached from checkouts.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_checkout_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('checkouts', sa.Integer(), nullable=False),
+        sa.Column('returns', sa.Integer(), nullable=False),
+        sa.Column('returned_duration_seconds', sa.BigInteger(), nullable=False),
+        sa.Column('active_patrons', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'daily_book_checkouts',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('checkouts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'book_id'),
+        if_not_exists=True
+    )
+    op.create_table(
+        'daily_patron_activity',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('patron_id', sa.Integer(), nullable=False),
+        sa.Column('checkouts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['patron_id'], ['patrons.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'patron_id'),
+        if_not_exists=True
+    )
+
+def downgrade() -> None:
+    op.drop_table('daily_patron_activity')
+    op.drop_table('daily_book_checkouts')
+    op.drop_table('daily_checkout_stats')
@@ -0,0 +1,65 @@
+"""book search indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 07:33:05.271946
+
+Indexes behind /books/search: on Postgres a GIN index over the full-text
+document plus trigram indexes for fuzzy title/author matches, on SQLite an
+FTS5 table kept in sync with books by triggers and filled from the books
+already there.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.utils.search import BOOK_SEARCH_DOCUMENT, BOOK_SEARCH_INDEXES
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+POSTGRES_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_books_search_document ON books USING gin ({BOOK_SEARCH_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)",
+)
+
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, author, isbn, content='books', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); END",
+    "CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, isbn ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, isbn) "
+    "VALUES ('delete', old.id, old.title, old.author, old.isbn); "
+    "INSERT INTO books_fts(rowid, title, author, isbn) "
+    "VALUES (new.id, new.title, new.author, new.isbn); END",
+)
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        # An external-content FTS table starts out empty; index existing books
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for name in reversed(BOOK_SEARCH_INDEXES):
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    elif dialect == 'sqlite':
+        for name in ('books_fts_update', 'books_fts_delete', 'books_fts_insert'):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS books_fts")
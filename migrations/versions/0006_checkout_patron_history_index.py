@@ -0,0 +1,30 @@
+"""checkout patron history index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 09:12:47.630518
+
+A patron's checkout history is paged by id, which the (patron_id,
+is_returned) index cannot serve without a sort. Built CONCURRENTLY on
+Postgres like the indexes in 0002.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            op.create_index('ix_checkouts_patron_id_id', 'checkouts', ['patron_id', 'id'],
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('ix_checkouts_patron_id_id', 'checkouts', ['patron_id', 'id'], if_not_exists=True)
+
+def downgrade() -> None:
+    op.drop_index('ix_checkouts_patron_id_id', table_name='checkouts', if_exists=True)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+# Settings are read at import time, so pin them before the app is imported:
+# a throwaway SQLite database, no rate limiting, no principal cache (so query
+# counts are the uncached worst case) and cheap password hashes
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["PRINCIPAL_CACHE_BACKEND"] = "none"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database.database import Base, engine
+from app.management_commands.create_superuser import create_superuser
+from app.models import models
+from app.utils import redis_client
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "admin-password"
+
+@pytest.fixture(autouse=True)
+def redis_server():
+    server = fakeredis.FakeServer()
+    redis_client._redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_client._async_redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    yield server
+    redis_client._redis = redis_client._async_redis = None
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+@pytest.fixture
+def client(db):
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def admin_headers(client, db):
+    create_superuser(ADMIN_EMAIL, ADMIN_PASSWORD)
+    db.execute(text("UPDATE patrons SET name = 'Admin' WHERE email = :email"), {"email": ADMIN_EMAIL})
+    db.commit()
+    response = client.post("/token", data={"username": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from app.models import models
+from app.utils.analytics import rolled_up_through, rollup_pending_days, summarize
+
+def test_rollup_runs_are_capped_and_resume(db):
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    book = models.Book(title="Dune", author="Herbert", isbn="isbn-1")
+    patron = models.Patron(name="Reader", email="reader@example.com", hashed_password="x")
+    db.add_all([book, patron])
+    db.flush()
+    db.add_all([
+        models.Checkout(book_id=book.id, patron_id=patron.id, checkout_date=today - timedelta(days=days_ago),
+                        due_date=today, is_returned=False)
+        for days_ago in range(1, 26)
+    ])
+    db.commit()
+    first_day = (today - timedelta(days=25)).date()
+
+    assert rollup_pending_days(db, max_days=10) == 10
+    assert rolled_up_through(db) == first_day + timedelta(days=9)
+    # Days not rolled up yet are still counted, live
+    assert summarize(db, first_day, today.date())["total_checkouts"] == 25
+
+    assert rollup_pending_days(db, max_days=10) == 10
+    assert rollup_pending_days(db, max_days=None) == 5
+    assert rollup_pending_days(db) == 0
+    assert summarize(db, first_day, today.date())["total_checkouts"] == 25
@@ -0,0 +1,27 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from app.database.database import engine
+from app.models import models
+from app.utils.catalog_import import import_books
+
+def test_import_upserts_on_isbn(db):
+    first = b"title,author,isbn,quantity\nDune,Herbert,isbn-1,2\nEmma,Austen,isbn-2,1\n"
+    assert import_books(engine, io.BytesIO(first), "csv") == {"imported": 2, "failed": 0, "errors": []}
+
+    second = b'{"title":"Dune Messiah","author":"Herbert","isbn":"isbn-1","quantity":3}\n{"title":"x"}\n'
+    report = import_books(engine, io.BytesIO(second), "ndjson")
+    assert report["imported"] == 1
+    assert report["failed"] == 1
+
+    books = {book.isbn: book for book in db.scalars(select(models.Book))}
+    assert (books["isbn-1"].title, books["isbn-1"].quantity, books["isbn-1"].available_quantity) == ("Dune Messiah", 3, 3)
+    assert books["isbn-2"].title == "Emma"
+
+def test_import_rejects_unsupported_databases():
+    mssql = SimpleNamespace(dialect=SimpleNamespace(name="mssql"))
+    with pytest.raises(ValueError, match="does not support the 'mssql' database"):
+        import_books(mssql, io.BytesIO(b"title,author,isbn,quantity\n"), "csv")
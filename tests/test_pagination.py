@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import select
+
+from app.models import models
+from app.utils.pagination import keyset_query, split_page
+
+def page_through(db, model, sort_column, descending=False, limit=2):
+    ids, cursor = [], ""
+    while cursor is not None:
+        stmt = keyset_query(select(model), model, cursor, limit, sort_column, descending)
+        rows, cursor = split_page(db.scalars(stmt).all(), model, limit, sort_column)
+        ids.extend(row.id for row in rows)
+    return ids
+
+@pytest.fixture
+def books(db):
+    titles = ["b", None, "a", None, "b", "c", None]
+    db.add_all([models.Book(title=title, isbn=f"isbn-{i}") for i, title in enumerate(titles)])
+    db.commit()
+    return db.scalars(select(models.Book)).all()
+
+def test_keyset_pages_include_null_sort_keys_last(db, books):
+    ids = page_through(db, models.Book, models.Book.title)
+    assert ids == [3, 1, 5, 6, 2, 4, 7]
+
+def test_descending_keyset_pages_include_null_sort_keys_last(db, books):
+    ids = page_through(db, models.Book, models.Book.title, descending=True)
+    assert ids == [6, 5, 1, 3, 7, 4, 2]
+
+def test_keyset_pages_by_id(db, books):
+    assert page_through(db, models.Book, None) == [1, 2, 3, 4, 5, 6, 7]
+    assert page_through(db, models.Book, None, descending=True) == [7, 6, 5, 4, 3, 2, 1]
+
+def test_book_listing_cursor_reaches_untitled_books(client, books):
+    ids, cursor = [], ""
+    while cursor is not None:
+        page = client.get("/books/", params={"cursor": cursor, "limit": 3, "sort": "title"}).json()
+        ids.extend(book["id"] for book in page["items"])
+        cursor = page["next_cursor"]
+    assert ids == [3, 1, 5, 6, 2, 4, 7]
@@ -0,0 +1,40 @@
+from app.utils.query_budget import assert_within_budget
+
+def create_patron_and_book(client):
+    patron = client.post("/patrons/", json={"name": "Reader", "email": "reader@example.com", "password": "secret"}).json()
+    book = client.post("/books/", json={"title": "Dune", "author": "Herbert", "isbn": "isbn-1", "quantity": 2}).json()
+    return patron["id"], book["id"]
+
+def test_patron_etag_changes_on_checkout_and_return(client):
+    patron_id, book_id = create_patron_and_book(client)
+    first = client.get(f"/patrons/{patron_id}")
+    assert client.get(f"/patrons/{patron_id}", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    checkout = assert_within_budget(client, "POST", "/checkouts/", json={
+        "book_id": book_id, "patron_id": patron_id, "due_date": "2030-01-01T00:00:00"
+    })
+    assert checkout.status_code == 200
+    checked_out = client.get(f"/patrons/{patron_id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert checked_out.status_code == 200
+    assert [item["id"] for item in checked_out.json()["checkouts"]] == [checkout.json()["id"]]
+
+    assert_within_budget(client, "POST", f"/checkouts/{checkout.json()['id']}/return", params={"patron_id": patron_id})
+    returned = client.get(f"/patrons/{patron_id}", headers={"If-None-Match": checked_out.headers["ETag"]})
+    assert returned.status_code == 200
+    assert returned.json()["checkouts"][0]["is_returned"] is True
+
+def test_patron_etag_changes_on_batch_checkout_and_return(client):
+    patron_id, book_id = create_patron_and_book(client)
+    etag = client.get(f"/patrons/{patron_id}").headers["ETag"]
+
+    batch = assert_within_budget(client, "POST", "/checkouts/batch", json={"patron_id": patron_id, "book_ids": [book_id, book_id]})
+    assert batch.json()["committed"] is True
+    checked_out = client.get(f"/patrons/{patron_id}", headers={"If-None-Match": etag})
+    assert checked_out.status_code == 200
+    assert len(checked_out.json()["checkouts"]) == 2
+
+    checkout_ids = [item["checkout"]["id"] for item in batch.json()["items"]]
+    assert_within_budget(client, "POST", "/checkouts/batch/return", json={"patron_id": patron_id, "checkout_ids": checkout_ids})
+    returned = client.get(f"/patrons/{patron_id}", headers={"If-None-Match": checked_out.headers["ETag"]})
+    assert returned.status_code == 200
+    assert all(item["is_returned"] for item in returned.json()["checkouts"])
@@ -0,0 +1,28 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.utils.principal_cache import PrincipalCache
+
+PRINCIPAL = {
+    "id": 1, "name": "Reader", "email": "reader@example.com", "is_active": True, "is_superuser": False,
+    "membership_date": datetime(2026, 1, 1), "created_at": datetime(2026, 1, 1), "updated_at": datetime(2026, 1, 2),
+}
+
+def cache_roundtrip(backend: str, data: dict):
+    cache = PrincipalCache(backend=backend, ttl=60)
+
+    async def roundtrip():
+        await cache.set(data["email"], data)
+        return await cache.get(data["email"])
+
+    return asyncio.run(roundtrip())
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_active_principals_are_cached(backend):
+    assert cache_roundtrip(backend, PRINCIPAL) == PRINCIPAL
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_inactive_principals_are_not_cached(backend):
+    assert cache_roundtrip(backend, PRINCIPAL | {"is_active": False}) is None
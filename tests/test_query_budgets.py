@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import models
+from app.utils.analytics import rollup_pending_days
+from app.utils.query_budget import assert_within_budget
+
+# Every budgeted route below is checked against its @query_budget with a
+# history long enough that an N+1 query or a full-history load would show
+
+@pytest.fixture
+def library(db, admin_headers):
+    now = datetime.utcnow()
+    books = [models.Book(title=f"Book {i}", author="Author", isbn=f"isbn-{i}", quantity=5, available_quantity=5) for i in range(5)]
+    patrons = [models.Patron(name=f"Patron {i}", email=f"patron{i}@example.com", hashed_password="x") for i in range(3)]
+    db.add_all(books + patrons)
+    db.flush()
+    for i in range(60):
+        checkout_date = now - timedelta(days=i % 20, hours=i)
+        returned = i % 3 != 0
+        db.add(models.Checkout(
+            book_id=books[i % len(books)].id,
+            patron_id=patrons[i % len(patrons)].id,
+            checkout_date=checkout_date,
+            due_date=checkout_date + timedelta(days=14),
+            return_date=checkout_date + timedelta(days=3) if returned else None,
+            is_returned=returned,
+        ))
+    db.commit()
+    rollup_pending_days(db)
+    return books, patrons
+
+def test_book_detail_within_budget(client, library):
+    books, _ = library
+    response = assert_within_budget(client, "GET", f"/books/{books[0].id}")
+    assert response.status_code == 200
+    assert len(response.json()["checkouts"]) == 12
+
+def test_current_user_within_budget(client, admin_headers):
+    response = assert_within_budget(client, "GET", "/users/me/", headers=admin_headers)
+    assert response.status_code == 200
+
+def test_patron_detail_within_budget(client, library):
+    _, patrons = library
+    response = assert_within_budget(client, "GET", f"/patrons/{patrons[0].id}")
+    assert response.status_code == 200
+    assert len(response.json()["checkouts"]) == 20
+
+def test_checkouts_list_within_budget(client, library, admin_headers):
+    response = assert_within_budget(client, "GET", "/admin/checkouts/all", headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 60
+
+    response = assert_within_budget(client, "GET", "/admin/checkouts/all", params={"cursor": "", "limit": 25}, headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 25
+
+def test_analytics_summary_within_budget(client, library, admin_headers):
+    response = assert_within_budget(client, "GET", "/admin/analytics/summary", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["total_checkouts"] == 60